@@ -0,0 +1,199 @@
+import argparse
+import contextlib
+import io
+import json
+import random
+import statistics
+import sys
+import time
+import numpy as np
+import Corpus
+import Lemmatizer
+import RottenTomatoesClassifier
+import SyntheticCorpus
+from model import NaiveBayes
+from model import Markov
+from model import SparseNaiveBayes
+from model import SparseMarkov
+
+
+# Times each stage of training and classifying with every model on synthetic corpora of several sizes: lemmatizing,
+# interning and preparing the corpus, the initial maximization step, the expectation and maximization steps of EM
+# rounds, printing the top words and classifying held out reviews, along with the accuracy on those and the memory
+# the model takes. Results can be saved as a baseline that later runs are compared against, so that a change can be
+# checked to scale before it is deployed
+class Benchmark:
+    # the models that can be benchmarked, by name
+    MODELS = {"NaiveBayes": NaiveBayes.NaiveBayes, "Markov": Markov.Markov,
+              "SparseNaiveBayes": SparseNaiveBayes.SparseNaiveBayes, "SparseMarkov": SparseMarkov.SparseMarkov}
+    # the largest drop in accuracy from the baseline that isn't a regression
+    ACCURACY_TOLERANCE = 0.02
+    # stages faster than this, in seconds, are too short to be timed reliably, so aren't counted as regressions
+    MIN_SECONDS = 0.01
+
+    # scales are the numbers of training reviews to benchmark with, each with a twentieth as many held out reviews.
+    # vocabulary, skew and seedFraction shape the synthetic corpora, as in SyntheticCorpus. rounds is the number of
+    # EM rounds timed, lemmatize whether the reviews are lemmatized and tokenizer what they are tokenized with, as in
+    # Lemmatizer, and models the names of the models benchmarked
+    def __init__(self, scales, vocabulary=20000, skew=1.1, seedFraction=0.01, rounds=3, lemmatize=True,
+                 models=tuple(MODELS), seed=2019, tokenizer="nltk"):
+        self.scales = scales
+        self.vocabulary = vocabulary
+        self.skew = skew
+        self.seedFraction = seedFraction
+        self.rounds = rounds
+        self.lemmatize = lemmatize
+        self.tokenizer = tokenizer
+        self.models = models
+        self.seed = seed
+
+    # returns the settings the results depend on, which a baseline has to share to be compared against
+    def settings(self):
+        return {"vocabulary": self.vocabulary, "skew": self.skew, "seedFraction": self.seedFraction,
+                "rounds": self.rounds, "lemmatize": self.lemmatize, "tokenizer": self.tokenizer,
+                "seed": self.seed}
+
+    # runs the benchmark at every scale, returning the results of every stage by "scale/model/stage"
+    def run(self):
+        results = {}
+        for sentences in self.scales:
+            results.update(self.runScale(sentences))
+        return results
+
+    # runs the benchmark on a synthetic corpus of the number of training reviews, returning the results of every stage
+    def runScale(self, sentences):
+        corpus = SyntheticCorpus.SyntheticCorpus(sentences, self.vocabulary, self.skew, self.seedFraction,
+                                                 max(1, sentences // 40), self.seed)
+        training = list(corpus.trainingSentences())
+        tests = corpus.testSentences()
+        testLines = [review for reviews in tests for review in reviews]
+        labels = np.repeat(np.arange(len(tests)), [len(reviews) for reviews in tests])
+
+        lemmatizer = Lemmatizer.Lemmatizer(tokenizer=self.tokenizer)
+        start = time.perf_counter()
+        training = lemmatizer.lemmatize(self.lemmatize, training, False)
+        testLines = lemmatizer.lemmatize(self.lemmatize, testLines, False)
+        results = {str(sentences) + "/-/lemmatize": self.result(time.perf_counter() - start, len(training))}
+        for name in self.models:
+            print("Benchmarking " + name + " on " + str(sentences) + " sentences....", file=sys.stderr)
+            for stage, result in self.runModel(self.MODELS[name](), training, testLines, labels).items():
+                results[str(sentences) + "/" + name + "/" + stage] = result
+        return results
+
+    # trains the model on the lemmatized training reviews and classifies the lemmatized test reviews with it,
+    # returning the results of each stage by name
+    def runModel(self, model, training, tests, labels):
+        results = {}
+        start = time.perf_counter()
+        corpus = Corpus.Corpus.of(training, model.vocabulary)
+        prepared = model.prepare(corpus)
+        results["preprocess"] = self.result(time.perf_counter() - start, len(corpus))
+
+        classifier = RottenTomatoesClassifier.RottenTomatoesClassifier()
+        start = time.perf_counter()
+        applied = classifier.randomInit(corpus, random.Random(self.seed))
+        model.updateAll(prepared, applied)
+        results["initialize"] = self.result(time.perf_counter() - start, len(corpus))
+
+        # the median time of each step over the EM rounds
+        expectations = []
+        maximizations = []
+        for i in range(self.rounds):
+            start = time.perf_counter()
+            classes = np.asarray(model.scoreAll(prepared)[0])
+            expectations.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            model.updateAll(prepared, classes - applied)
+            applied = classes
+            maximizations.append(time.perf_counter() - start)
+        results["expectation"] = self.result(statistics.median(expectations), len(corpus))
+        results["maximization"] = self.result(statistics.median(maximizations), len(corpus))
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            model.printTopWords(10)
+        results["topWords"] = self.result(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        probs = np.asarray(model.classifyBatch(tests))
+        results["classify"] = self.result(time.perf_counter() - start, len(tests))
+        # the classes are told apart by the seeds, so class 0 stands for the negative reviews
+        results["classify"]["accuracy"] = float(np.mean(probs.argmax(axis=1) == labels))
+        results["classify"]["modelBytes"] = model.memorySize()
+        return results
+
+    # returns the result of a stage that took the seconds, processing the number of sentences if given
+    @staticmethod
+    def result(seconds, sentences=None):
+        result = {"seconds": seconds}
+        if sentences is not None:
+            result["sentencesPerSecond"] = sentences / seconds if seconds > 0 else 0.0
+        return result
+
+    # prints a table of the results, compared against those of the baseline if given, returning the stages that
+    # regressed: those more than tolerance times slower than in the baseline, or less accurate. The table is sorted
+    # as the results are, by scale and then model
+    @staticmethod
+    def report(results, baseline=None, tolerance=0.2):
+        regressions = []
+        print("%-36s %10s %14s %10s %8s %10s" % ("stage", "seconds", "sentences/s", "baseline", "ratio", "accuracy"))
+        for key, result in results.items():
+            previous = baseline.get(key) if baseline is not None else None
+            line = "%-36s %10.4f %14s" % (key, result["seconds"], "%.0f" % result["sentencesPerSecond"]
+                                          if "sentencesPerSecond" in result else "")
+            if previous is not None:
+                ratio = result["seconds"] / previous["seconds"] if previous["seconds"] > 0 else 1.0
+                line += " %10.4f %8.2f" % (previous["seconds"], ratio)
+                if ratio > 1 + tolerance and result["seconds"] >= Benchmark.MIN_SECONDS:
+                    regressions.append(key)
+                elif result.get("accuracy", 1.0) < previous.get("accuracy", 0.0) - Benchmark.ACCURACY_TOLERANCE:
+                    regressions.append(key)
+            else:
+                line += " %10s %8s" % ("", "")
+            if "accuracy" in result:
+                line += " %10.3f" % result["accuracy"]
+            print(line)
+        return regressions
+
+
+# runs the benchmark, comparing it against a baseline and saving it as one if requested. Exits with status 1 if any
+# stage regressed from the baseline
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", type=str, default="1000,10000,100000")
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--skew", type=float, default=1.1)
+    parser.add_argument("--seedFraction", type=float, default=0.01)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("-l", "--lemmatize", type=RottenTomatoesClassifier.RottenTomatoesClassifier.strToBool,
+                        default=True)
+    parser.add_argument("--tokenizer", choices=Lemmatizer.Lemmatizer.TOKENIZERS, default="nltk")
+    parser.add_argument("--models", type=str, default=",".join(Benchmark.MODELS))
+    parser.add_argument("--seed", type=int, default=2019)
+    parser.add_argument("--baseline", type=str, default=None)
+    parser.add_argument("--saveBaseline", type=str, default=None)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+    models = args.models.split(",")
+    for name in models:
+        if name not in Benchmark.MODELS:
+            parser.error("unknown model " + name + ", expected one of " + ", ".join(Benchmark.MODELS))
+    benchmark = Benchmark([int(scale) for scale in args.scales.split(",")], args.vocabulary, args.skew,
+                          args.seedFraction, args.rounds, args.lemmatize, models, args.seed,
+                          args.tokenizer)
+
+    baseline = None
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            stored = json.load(f)
+        if stored["settings"] != benchmark.settings():
+            print("The baseline was run with other settings: " + json.dumps(stored["settings"]), file=sys.stderr)
+        baseline = stored["results"]
+    results = benchmark.run()
+    regressions = Benchmark.report(results, baseline, args.tolerance)
+    if args.saveBaseline is not None:
+        with open(args.saveBaseline, "w") as f:
+            json.dump({"settings": benchmark.settings(), "results": results}, f, indent=1)
+    if regressions:
+        print("Regressed: " + ", ".join(regressions))
+        sys.exit(1)
@@ -0,0 +1,201 @@
+import concurrent.futures
+import http.server
+import json
+import queue
+import sys
+import threading
+import time
+from collections import deque
+import numpy as np
+
+
+# A long-running service that classifies a stream of sentences, read from stdin or posted to a local HTTP endpoint.
+# Sentences are grouped into micro-batches of at most batchSize sentences, waiting at most batchWait seconds for a
+# batch to fill, and each batch is lemmatized and scored with a single classifyBatch call on the model. Throughput and
+# p50/p99 latency are tracked for every sentence
+class ClassificationService:
+    # the number of most recent latencies the percentiles are computed over
+    LATENCY_WINDOW = 100000
+
+    def __init__(self, model, lemmatizer, lemmatize, batchSize=64, batchWait=0.005):
+        self.model = model
+        self.lemmatizer = lemmatizer
+        # whether the sentences are lemmatized before being classified, as the model's training sentences were
+        self.lemmatize = lemmatize
+        self.batchSize = batchSize
+        self.batchWait = batchWait
+        # the queued (sentence, future, arrival time) requests, and None once the service is stopping
+        self.requests = queue.Queue()
+        # the seconds between the arrival and classification of the most recent sentences
+        self.latencies = deque(maxlen=self.LATENCY_WINDOW)
+        self.classified = 0
+        self.batches = 0
+        self.started = None
+        self.lock = threading.Lock()
+        self.batcher = threading.Thread(target=self.processBatches, daemon=True)
+
+    # starts classifying queued sentences
+    def start(self):
+        self.started = time.perf_counter()
+        self.batcher.start()
+
+    # classifies the sentences that are already queued, then stops
+    def stop(self):
+        self.requests.put(None)
+        self.batcher.join()
+        self.lemmatizer.close()
+
+    # queues a sentence for classification, returning a Future of its lemmatized Sentence and class probabilities
+    def submit(self, sentence):
+        future = concurrent.futures.Future()
+        self.requests.put((sentence, future, time.perf_counter()))
+        return future
+
+    # classifies queued sentences a micro-batch at a time until the service is stopped
+    def processBatches(self):
+        stopping = False
+        while not stopping:
+            request = self.requests.get()
+            if request is None:
+                break
+            batch = [request]
+            deadline = time.perf_counter() + self.batchWait
+            while len(batch) < self.batchSize:
+                try:
+                    request = self.requests.get(timeout=max(deadline - time.perf_counter(), 0))
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopping = True
+                    break
+                batch.append(request)
+            self.classifyBatch(batch)
+
+    # lemmatizes and classifies a batch of requests, completing their futures
+    def classifyBatch(self, batch):
+        try:
+            sentences = self.lemmatizer.lemmatize(self.lemmatize, [sentence for sentence, _, _ in batch], False)
+            probs = self.model.classifyBatch(sentences)
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        now = time.perf_counter()
+        for (_, future, arrival), sentence, p in zip(batch, sentences, probs):
+            future.set_result((sentence, [float(x) for x in p]))
+        with self.lock:
+            self.latencies.extend(now - arrival for _, _, arrival in batch)
+            self.classified += len(batch)
+            self.batches += 1
+
+    # returns the number of sentences and batches classified so far, the throughput, and the latency percentiles
+    def stats(self):
+        with self.lock:
+            latencies = np.array(self.latencies)
+            classified = self.classified
+            batches = self.batches
+        seconds = time.perf_counter() - self.started
+        return {"classified": classified,
+                "batches": batches,
+                "meanBatchSize": classified / batches if batches else 0.0,
+                "seconds": seconds,
+                "sentencesPerSecond": classified / seconds if seconds > 0 else 0.0,
+                "p50LatencyMs": float(np.percentile(latencies, 50)) * 1000 if len(latencies) else 0.0,
+                "p99LatencyMs": float(np.percentile(latencies, 99)) * 1000 if len(latencies) else 0.0}
+
+    # prints the stats to stderr, out of the way of the classifications
+    def report(self):
+        print("Service stats: " + json.dumps(self.stats()), file=sys.stderr)
+
+    # classifies every line of the input, writing the lemmatized sentence and its class probabilities to the output
+    # in input order, or the line and the error if its batch couldn't be classified. Lines are queued as fast as they
+    # are read, so they are batched together whenever they arrive faster than they are classified
+    def serveLines(self, lines=sys.stdin, output=sys.stdout):
+        # bounds the number of sentences read ahead of the output
+        pending = queue.Queue(maxsize=self.batchSize * 16)
+
+        def write():
+            while True:
+                request = pending.get()
+                if request is None:
+                    return
+                line, future = request
+                # a failed batch fails only its own lines, so that the rest of the queue is still drained
+                try:
+                    sentence, probs = future.result()
+                except Exception as e:
+                    print(line + ": error: " + str(e), file=output, flush=True)
+                    continue
+                print(sentence.lemmas + ": " + "".join(str(p) + " " for p in probs), file=output, flush=True)
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        self.start()
+        try:
+            for line in lines:
+                line = line.strip()
+                if line:
+                    pending.put((line, self.submit(line)))
+        finally:
+            pending.put(None)
+            writer.join()
+            self.stop()
+            self.report()
+
+    # serves classifications over HTTP on the host and port until interrupted
+    def serveHttp(self, port, host="127.0.0.1"):
+        server = self.httpServer(port, host)
+        self.start()
+        print("Serving classifications on http://" + host + ":" + str(server.server_address[1]))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stop()
+            self.report()
+
+    # returns an HTTP server of classifications on the host and port, which is yet to serve them. POST /classify takes
+    # one sentence per line and answers with their lemmas and class probabilities as JSON, or the sentence and the
+    # error for those whose batch couldn't be classified, and GET /stats answers with the stats
+    def httpServer(self, port, host="127.0.0.1"):
+        service = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path != "/classify":
+                    self.reply(404, {"error": "unknown path " + self.path})
+                    return
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8")
+                lines = [line.strip() for line in body.splitlines() if line.strip()]
+                futures = [service.submit(line) for line in lines]
+                results = []
+                for line, future in zip(lines, futures):
+                    try:
+                        sentence, probs = future.result()
+                    except Exception as e:
+                        results.append({"sentence": line, "error": str(e)})
+                        continue
+                    results.append({"sentence": sentence.lemmas, "probabilities": probs})
+                self.reply(200, {"results": results})
+
+            def do_GET(self):
+                if self.path != "/stats":
+                    self.reply(404, {"error": "unknown path " + self.path})
+                    return
+                self.reply(200, service.stats())
+
+            def reply(self, status, data):
+                body = json.dumps(data).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            # keeps the per-request logging out of the output
+            def log_message(self, format, *args):
+                return
+
+        return http.server.ThreadingHTTPServer((host, port), Handler)
@@ -0,0 +1,77 @@
+from array import array
+import numpy as np
+
+
+# A corpus of sentences interned once against a shared vocabulary. The word ids of every sentence are stored back to
+# back in one flat array, with the offset at which each sentence starts kept in a second one (as in a CSR matrix), so
+# a sentence costs a few bytes per word rather than two strings, and sentences are addressed by position rather than
+# hashed. Semi-supervised seed markers are stripped from the sentences and kept as their class label instead
+class Corpus:
+    # the markers of the semi-supervised sentences, and the class each of them stands for
+    SEEDS = {":(": 0, ":)": 1}
+
+    # vocabulary is the Vocabulary words are interned in. Words that aren't in it are added to it when grow is set,
+    # and interned as -1 otherwise. Seed markers are only recognized when seeded is set
+    def __init__(self, vocabulary, grow=True, seeded=True):
+        self.vocabulary = vocabulary
+        self.grow = grow
+        self.seeded = seeded
+        # the word ids of every sentence, back to back
+        self.tokens = array('i')
+        # the offset in tokens at which each sentence starts, followed by the total number of tokens
+        self.offsets = array('q', [0])
+        # the class of each seed sentence, or -1 for the sentences without a seed marker
+        self.labels = array('b')
+
+    def __len__(self):
+        return len(self.labels)
+
+    # adds a sentence to the corpus, interning its space-separated lemmas
+    def add(self, sentence):
+        words = sentence.lemmas.split(" ")
+        label = self.SEEDS.get(sentence.words[:2], -1) if self.seeded else -1
+        if label >= 0:
+            words = self.stripSeed(words, sentence.words[:2])
+        for word in words:
+            index = self.vocabulary.index(word, self.grow)
+            self.tokens.append(-1 if index is None else index)
+        self.offsets.append(len(self.tokens))
+        self.labels.append(label)
+
+    # adds every sentence to the corpus
+    def addAll(self, sentences):
+        for sentence in sentences:
+            self.add(sentence)
+
+    # returns the words of the sentence at the index, which are the vocabulary's own strings rather than copies
+    def words(self, index):
+        return tuple([self.vocabulary.words[w] for w in self.tokens[self.offsets[index]:self.offsets[index + 1]]])
+
+    # returns the word ids of every sentence, back to back, without copying them
+    def tokenArray(self):
+        return np.frombuffer(self.tokens, dtype=np.int32)
+
+    # returns the offset at which each sentence starts, followed by the total number of tokens, without copying them
+    def offsetArray(self):
+        return np.frombuffer(self.offsets, dtype=np.int64)
+
+    # returns the words without the leading tokens that spell out the seed marker. The marker is a single word in
+    # raw sentences, but the tokenizer splits it into one word per character in lemmatized ones
+    @staticmethod
+    def stripSeed(words, seed):
+        prefix = ""
+        for i, word in enumerate(words):
+            prefix += word
+            if prefix == seed:
+                # like str.split, a sentence always has at least one (possibly empty) word
+                return words[i + 1:] or [""]
+            if not seed.startswith(prefix):
+                break
+        return words
+
+    # returns a corpus of the sentences
+    @staticmethod
+    def of(sentences, vocabulary, grow=True, seeded=True):
+        corpus = Corpus(vocabulary, grow, seeded)
+        corpus.addAll(sentences)
+        return corpus
@@ -0,0 +1,88 @@
+import io
+import zipfile
+
+
+# Streams the sentences of a training file a line at a time. Files are either in the plain format of
+# trainEMsemisup.txt, with a sentence per line, or Kaggle's tab separated PhraseId/SentenceId/Phrase[/Sentiment]
+# dump (train.tsv, or train.tsv.zip as downloaded), of which only the first phrase of each SentenceId is a whole
+# sentence. In both, sentences may start with a :) or :( seed marker, and a line starting with --- ends the training
+# sentences and starts the test section
+class CorpusReader:
+    # the start of the line that separates the training sentences from the test section
+    SEPARATOR = "---"
+    # the headings of the test section, followed by the sentences of the class they name
+    HEADINGS = {"Negative:": 0, "Positive:": 1}
+
+    def __init__(self, path):
+        self.path = path
+        # the lines of the test section, kept once a pass over the training sentences has reached it
+        self.testLines = None
+
+    # yields the training sentences, keeping the test section that follows them so that the file is read once
+    def trainingSentences(self):
+        stream, tabSeparated = self.openFile()
+        with stream:
+            lines = self.nonEmptyLines(stream)
+            if tabSeparated:
+                lines = self.firstPhrases(lines)
+            for line in lines:
+                if line[:3] == self.SEPARATOR:
+                    self.testLines = list(lines)
+                    return
+                yield line
+        self.testLines = []
+
+    # returns the lines of the test section, reading past the training sentences if no pass over them has yet
+    def testSentences(self):
+        if self.testLines is None:
+            for sentence in self.trainingSentences():
+                pass
+        return self.testLines
+
+    # returns the sentences of the test section without its headings, along with the class each of them is listed
+    # under (0 for negative, 1 for positive, or -1 before any heading)
+    def labelledTestSentences(self):
+        sentences = []
+        labels = []
+        label = -1
+        for line in self.testSentences():
+            if line in self.HEADINGS:
+                label = self.HEADINGS[line]
+            else:
+                sentences.append(line)
+                labels.append(label)
+        return sentences, labels
+
+    # opens the file, or the first .tsv or .txt file in it if it is a zip archive, returning the text stream along
+    # with whether it is tab separated
+    def openFile(self):
+        if not self.path.endswith(".zip"):
+            return open(self.path), self.path.endswith(".tsv")
+        with zipfile.ZipFile(self.path) as archive:
+            names = archive.namelist()
+            name = next((name for name in names if name.endswith((".tsv", ".txt"))), names[0])
+            # the member stays readable once the archive is closed
+            return io.TextIOWrapper(archive.open(name), encoding="utf-8"), name.endswith(".tsv")
+
+    # yields the stripped lines of the stream, skipping empty ones
+    @staticmethod
+    def nonEmptyLines(stream):
+        for line in stream:
+            line = line.strip()
+            if line:
+                yield line
+
+    # yields the phrase of the first row of each SentenceId of tab separated lines, skipping the header. Only the
+    # ids already seen are kept, rather than their phrases. Rows with an empty phrase are skipped, as they would be
+    # sentences without words. Lines without tabs, such as the separator and the headings of the test section, are
+    # kept as they are
+    @staticmethod
+    def firstPhrases(lines):
+        seen = set()
+        for line in lines:
+            fields = line.split("\t")
+            if len(fields) < 3:
+                yield line
+            elif fields[1].isdigit() and fields[1] not in seen and fields[2].strip():
+                seen.add(fields[1])
+                yield fields[2].strip()
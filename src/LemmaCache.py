@@ -0,0 +1,115 @@
+import json
+import os
+from collections import OrderedDict
+from importlib import metadata
+
+
+# A bounded, least recently used memo of the part of speech of each word and of the lemma of each (word, part of
+# speech) pair. It is backed by a file so that repeated runs over the same corpus skip tagging and lemmatizing
+# entirely, and the file is ignored when it was written with a different version of NLTK
+class LemmaCache:
+    # the number of parts of speech and of lemmas kept in memory (and on disk)
+    CAPACITY = 200000
+
+    def __init__(self, path=None, capacity=CAPACITY, trackAdded=False):
+        # the file the cache is loaded from and saved to, or None to keep it in memory only
+        self.path = path
+        self.capacity = capacity
+        # the parts of speech and lemmas added since takeAdded was last called, if trackAdded is set
+        self.addedTags = [] if trackAdded else None
+        self.addedLemmas = [] if trackAdded else None
+        # the WordNet part of speech of each word
+        self.tags = OrderedDict()
+        # the lemma of each (word, WordNet part of speech) pair
+        self.lemmas = OrderedDict()
+        # whether anything has been added since the cache was loaded
+        self.changed = False
+        self.load()
+
+    # returns the cached part of speech of the word, or None if it isn't cached
+    def getTag(self, word):
+        return self.get(self.tags, word)
+
+    # caches the part of speech of the word
+    def putTag(self, word, pos):
+        self.put(self.tags, word, pos)
+        if self.addedTags is not None:
+            self.addedTags.append((word, pos))
+
+    # returns the cached lemma of the word as the part of speech, or None if it isn't cached
+    def getLemma(self, word, pos):
+        return self.get(self.lemmas, (word, pos))
+
+    # caches the lemma of the word as the part of speech
+    def putLemma(self, word, pos, lemma):
+        self.put(self.lemmas, (word, pos), lemma)
+        if self.addedLemmas is not None:
+            self.addedLemmas.append((word, pos, lemma))
+
+    # returns the (word, pos) and (word, pos, lemma) entries added since the last call, so that the cache of a worker
+    # process can be merged into the cache of the main process
+    def takeAdded(self):
+        added = self.addedTags, self.addedLemmas
+        self.addedTags = []
+        self.addedLemmas = []
+        return added
+
+    # caches the entries returned by takeAdded of another cache
+    def merge(self, tags, lemmas):
+        for word, pos in tags:
+            self.putTag(word, pos)
+        for word, pos, lemma in lemmas:
+            self.putLemma(word, pos, lemma)
+
+    # reads the cache file, if there is one and it was written with the current version of NLTK
+    def load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            print("Ignoring unreadable lemma cache " + self.path)
+            return
+        if data.get("nltk") != self.nltkVersion():
+            print("Ignoring lemma cache written with NLTK " + str(data.get("nltk")))
+            return
+        for word, pos in data["tags"]:
+            self.put(self.tags, word, pos)
+        for word, pos, lemma in data["lemmas"]:
+            self.put(self.lemmas, (word, pos), lemma)
+        self.changed = False
+
+    # writes the cache file, if anything was added since it was loaded
+    def save(self):
+        if self.path is None or not self.changed:
+            return
+        data = {"nltk": self.nltkVersion(),
+                "tags": [[word, pos] for word, pos in self.tags.items()],
+                "lemmas": [[word, pos, lemma] for (word, pos), lemma in self.lemmas.items()]}
+        # written to a temporary file first so that an interrupted run can't leave a truncated cache behind
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(self.path + ".tmp", self.path)
+        self.changed = False
+
+    # returns the installed version of NLTK, read from its package metadata so that NLTK isn't imported for it
+    @staticmethod
+    def nltkVersion():
+        return metadata.version("nltk")
+
+    # returns the value of the key, marking it as the most recently used
+    @staticmethod
+    def get(entries, key):
+        value = entries.get(key)
+        if value is not None:
+            entries.move_to_end(key)
+        return value
+
+    # adds the key, evicting the least recently used keys beyond the capacity
+    def put(self, entries, key, value):
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > self.capacity:
+            entries.popitem(last=False)
+        self.changed = True
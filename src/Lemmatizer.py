@@ -1,58 +1,193 @@
+import itertools
+import math
+import multiprocessing
+import re
+import time
+import LemmaCache
 import Sentence
-import nltk
-from nltk.corpus import wordnet
+
+# NLTK takes over a second to import, so it is only imported once sentences are actually lemmatized
+nltk = None
+wordnet = None
 
 
 # Represents a lemmatizer, which reduces inflectional forms and sometimes derivationally related forms of a word to a
 # common base form, with the use of a vocabulary and morphological analysis of words
 class Lemmatizer:
+    # the most sentences whose new words are tagged together, and that are sent to a worker process at once
+    BATCH_SIZE = 1000
+    # the characters removed from sentences, as bytes. They are all ASCII, so deleting them from UTF-8 encoded
+    # sentences with bytes.translate, which is far faster than str.translate, leaves every other character intact
+    STOP_CHARACTERS = b".,!?\"'[];~\\/`"
+    # the tokens of the regex tokenizer: words, which may be joined by hyphens and wrapped in them like the -lrb-
+    # escapes of the corpus, seed markers, double dashes and single punctuation characters, so that runs of
+    # punctuation such as *** are split as nltk.word_tokenize splits them. Other than keeping seed markers and
+    # contractions such as gonna whole, it splits the sentences of trainEMsemisup.txt just as nltk.word_tokenize does
+    TOKEN_PATTERN = re.compile(r"-?\w+(?:-\w+)*-?|:[()]|--|[^\w\s]")
+    # the tokenizers sentences can be split into words with before they are lemmatized
+    TOKENIZERS = ["nltk", "regex"]
+
+    # cachePath is the file lemmas are memoized in across runs, or None to only memoize them in memory, and workers
+    # is the number of processes sentences are lemmatized in. tokenizer is either "nltk", which splits sentences with
+    # nltk.word_tokenize, or "regex", which splits them with TOKEN_PATTERN in a fraction of the time
+    def __init__(self, cachePath=None, workers=1, trackAdded=False, tokenizer="nltk"):
+        self.cachePath = cachePath
+        self.workers = workers
+        self.tokenizer = tokenizer
+        # the WordNet lemmatizer, loaded on first use
+        self.lemmatizer = None
+        self.cache = LemmaCache.LemmaCache(cachePath, trackAdded=trackAdded)
+        # the part of speech tagger, loaded on first use
+        self.tagger = None
+        # the pool of worker processes, started on first use
+        self.pool = None
+        # the seconds spent lemmatizing so far
+        self.seconds = 0.0
 
-    # Maps the list of sentences to a list of lemmatized sentences
-    def lemmatize(self, lemmatize, sentences):
-        if lemmatize:
+    # Maps the list of sentences to a list of lemmatized sentences, printing the progress if verbose is set
+    def lemmatize(self, lemmatize, sentences, verbose=True):
+        start = time.perf_counter()
+        sentences = [self.removeStopCharacters(sentence) for sentence in sentences]
+        if not lemmatize:
+            # maps sentence to sentence
+            mappedSentences = [Sentence.Sentence(sentence, sentence) for sentence in sentences]
+            self.seconds += time.perf_counter() - start
+            return mappedSentences
+        if verbose:
             print("Lemmatizing Sentences...")
-        lemmatizer = nltk.WordNetLemmatizer()
         mappedSentences = []
-        for i, sentence in enumerate(sentences):
-            sentence = self.removeStopCharacters(sentence)
-            if lemmatize:
-                if i % 100 == 0 and i != 0:
-                    print(str(i) + "/" + str(len(sentences) - 1) + " sentences lemmatized")
-                lemmas = self.getLemmas(lemmatizer, sentence)
-                mappedSentences.append(Sentence.Sentence(sentence, lemmas)) # maps sentence to lemmas
-            else:
-                mappedSentences.append(Sentence.Sentence(sentence, sentence)) # maps sentence to sentence
+        for batch, lemmas in self.lemmatizeBatches(sentences):
+            for sentence, lemma in zip(batch, lemmas):
+                mappedSentences.append(Sentence.Sentence(sentence, lemma)) # maps sentence to lemmas
+            if verbose:
+                print(str(len(mappedSentences)) + "/" + str(len(sentences)) + " sentences lemmatized")
+        self.seconds += time.perf_counter() - start
         return mappedSentences
 
-    # Maps the sentence to it's lemma
-    def lemmatizeSingleton(self, lemmatize, sentence):
-        sentence = self.removeStopCharacters(sentence)
-        if lemmatize:
-            return Sentence.Sentence(sentence, self.getLemmas(nltk.WordNetLemmatizer(), sentence))
-        else:
-            return Sentence.Sentence(sentence, sentence)
+    # Lazily maps an iterable of sentences to lemmatized sentences, reading as many sentences at a time as the
+    # workers lemmatize together so that only those are held at once, printing the progress if verbose is set
+    def lemmatizeStream(self, lemmatize, sentences, verbose=True):
+        if lemmatize and verbose:
+            print("Lemmatizing Sentences...")
+        sentences = iter(sentences)
+        count = 0
+        batch = list(itertools.islice(sentences, self.BATCH_SIZE * self.workers))
+        while batch:
+            yield from self.lemmatize(lemmatize, batch, False)
+            count += len(batch)
+            if lemmatize and verbose:
+                print(str(count) + " sentences lemmatized")
+            batch = list(itertools.islice(sentences, self.BATCH_SIZE * self.workers))
 
-    # returns the sentence without characters that are deemed unnecessary
-    @staticmethod
-    def removeStopCharacters(sentence):
-        stopCharacters = ['.', ',', '!', '?', '\"', '\'', '[', ']', ';', '~', '\\', '/', '`']
-        for stopCharacter in stopCharacters:
-            sentence = sentence.replace(stopCharacter, "")
-        sentence = sentence.replace("  ", " ")  # removes extra whitespace
-        sentence = sentence.strip() # removes trailing and leading whitespace
-        sentence = sentence.lower() # makes the sentence all lowercase
-        return sentence
-
-    # derives the lemma for each respective word and part of speech, and builds a space-separated sentence with them
-    def getLemmas(self, lemmatizer, sentence):
-        return " ".join([lemmatizer.lemmatize(w, self.get_wordnet_pos(w)) for w in nltk.word_tokenize(sentence)])
+    # writes any newly memoized lemmas to the cache file and stops the worker processes
+    def close(self):
+        self.cache.save()
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    # yields each batch of sentences along with their lemmas, in input order. The batches are lemmatized by the
+    # pool of worker processes when there are several workers, and in this process otherwise
+    def lemmatizeBatches(self, sentences):
+        if self.workers <= 1:
+            for start in range(0, len(sentences), self.BATCH_SIZE):
+                batch = sentences[start:start + self.BATCH_SIZE]
+                yield batch, self.getLemmas(batch)
+            return
+        # small enough batches that every worker gets several of them
+        size = max(1, min(self.BATCH_SIZE, math.ceil(len(sentences) / (self.workers * 4))))
+        batches = [sentences[start:start + size] for start in range(0, len(sentences), size)]
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(self.workers, initWorker, (self.cachePath, self.tokenizer))
+        for batch, (lemmas, addedTags, addedLemmas) in zip(batches, self.pool.imap(lemmatizeBatch, batches)):
+            self.cache.merge(addedTags, addedLemmas)
+            yield batch, lemmas
+
+    # returns the sentence without characters that are deemed unnecessary, in lowercase and with its words separated
+    # by single spaces
+    @classmethod
+    def removeStopCharacters(cls, sentence):
+        return " ".join(sentence.encode().translate(None, cls.STOP_CHARACTERS).decode().lower().split())
+
+    # returns the words of the sentence, as split by the tokenizer
+    def tokenize(self, sentence):
+        if self.tokenizer == "regex":
+            return self.TOKEN_PATTERN.findall(sentence)
+        return nltk.word_tokenize(sentence)
+
+    # derives the lemma for each respective word and part of speech, and builds a space-separated sentence with them,
+    # for every sentence of the batch
+    def getLemmas(self, sentences):
+        if self.tokenizer == "nltk":
+            importNltk()
+        tokenized = [self.tokenize(sentence) for sentence in sentences]
+        self.tagWords(dict.fromkeys(w for words in tokenized for w in words))
+        return [" ".join([self.getLemma(w) for w in words]) for words in tokenized]
+
+    # tags every word whose part of speech isn't cached. Each word is still tagged as a sentence of its own, as it
+    # always has been, so batching doesn't change any lemmas
+    def tagWords(self, words):
+        untagged = [w for w in words if self.cache.getTag(w) is None]
+        if not untagged:
+            return
+        self.loadResources()
+        for word in untagged:
+            self.cache.putTag(word, self.get_wordnet_pos(self.tagger.tag([word])[0][1]))
+
+    # returns the lemma of the word for its part of speech, memoizing both
+    def getLemma(self, word):
+        pos = self.cache.getTag(word)
+        if pos is None:
+            self.tagWords([word])
+            pos = self.cache.getTag(word)
+        lemma = self.cache.getLemma(word, pos)
+        if lemma is None:
+            self.loadResources()
+            lemma = self.lemmatizer.lemmatize(word, pos)
+            self.cache.putLemma(word, pos, lemma)
+        return lemma
+
+    # loads the part of speech tagger, WordNet and its lemmatizer, if they haven't been already
+    def loadResources(self):
+        if self.tagger is None:
+            importNltk()
+            self.tagger = nltk.tag.PerceptronTagger()
+            wordnet.ensure_loaded()
+            self.lemmatizer = nltk.WordNetLemmatizer()
 
     # Map POS tag to first character lemmatize() accepts
     @staticmethod
-    def get_wordnet_pos(word):
-        tag = nltk.pos_tag([word])[0][1][0].upper()
+    def get_wordnet_pos(tag):
+        tag = tag[0].upper()
         tag_dict = {"J": wordnet.ADJ,
                     "N": wordnet.NOUN,
                     "V": wordnet.VERB,
                     "R": wordnet.ADV}
         return tag_dict.get(tag, wordnet.NOUN)
+
+
+# imports NLTK and its WordNet corpus reader, if they haven't been already
+def importNltk():
+    global nltk, wordnet
+    if nltk is None:
+        import nltk
+        from nltk.corpus import wordnet
+
+
+# the lemmatizer of a worker process
+workerLemmatizer = None
+
+
+# sets up a worker process with its own lemmatizer, loading the NLTK resources once for all of its batches
+def initWorker(cachePath, tokenizer):
+    global workerLemmatizer
+    workerLemmatizer = Lemmatizer(cachePath, trackAdded=True, tokenizer=tokenizer)
+    workerLemmatizer.loadResources()
+
+
+# lemmatizes a batch of sentences in a worker process, returning their lemmas along with the parts of speech and
+# lemmas the worker memoized for them
+def lemmatizeBatch(sentences):
+    lemmas = workerLemmatizer.getLemmas(sentences)
+    return (lemmas,) + workerLemmatizer.cache.takeAdded()
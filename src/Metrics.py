@@ -0,0 +1,99 @@
+import contextlib
+import json
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows, where peak RSS is left out of the metrics
+    resource = None
+
+
+# Records how long each stage of a run takes and how much memory it uses, as one JSON object per line in a file, so
+# that runs can be compared without patching the code. Stages are timed with stage(), and their records can carry
+# any other fields, such as the number of sentences they processed or the log-likelihood of an EM round. Without a
+# file nothing is measured or written
+class Metrics:
+
+    # path is the file the records are appended to, or None to not record anything. traceMemory also records the
+    # peak memory allocated by Python during each stage, which slows the whole run down considerably
+    def __init__(self, path=None, traceMemory=False):
+        self.path = path
+        self.traceMemory = traceMemory and path is not None
+        # the fields added to every record, such as the EM chain the records of a worker process are about
+        self.fields = {}
+        # the peak traced memory of each stage in progress, innermost last, so far as it is known. Starting a stage
+        # resets the peak, so the peak up to then is kept for the stages around it
+        self.peaks = []
+        self.started = time.perf_counter()
+        self.file = open(path, "a") if path is not None else None
+        if self.traceMemory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    # times the stage run within the with block, then records it. The fields yielded can be added to within the
+    # block, and a "sentences" field also records the number of sentences processed per second
+    @contextlib.contextmanager
+    def stage(self, name, **fields):
+        if self.file is None:
+            yield fields
+            return
+        if self.traceMemory:
+            if self.peaks:
+                self.peaks[-1] = max(self.peaks[-1], tracemalloc.get_traced_memory()[1])
+            self.peaks.append(0)
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield fields
+        finally:
+            # the peak of a stage that raised is still popped, and kept for the stages around it, but not recorded
+            seconds = time.perf_counter() - start
+            if self.traceMemory:
+                peak = max(self.peaks.pop(), tracemalloc.get_traced_memory()[1])
+                if self.peaks:
+                    self.peaks[-1] = max(self.peaks[-1], peak)
+                fields["tracedPeakBytes"] = peak
+        fields["seconds"] = seconds
+        if "sentences" in fields:
+            fields["sentencesPerSecond"] = fields["sentences"] / seconds if seconds > 0 else 0.0
+        self.record(name, **fields)
+
+    # writes a record of the stage with the fields, along with the seconds since the run started and the peak
+    # resident memory of the process so far
+    def record(self, name, **fields):
+        if self.file is None:
+            return
+        line = {"stage": name, "elapsed": time.perf_counter() - self.started}
+        line.update(self.fields)
+        line.update(fields)
+        if resource is not None:
+            line["peakRssBytes"] = self.peakRss()
+        # flushed a line at a time so that worker processes appending to the same file don't interleave records
+        self.file.write(json.dumps(line) + "\n")
+        self.file.flush()
+
+    # closes the file
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    # returns the peak resident memory of the process in bytes
+    @staticmethod
+    def peakRss():
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes everywhere but macOS
+        return peak if sys.platform == "darwin" else peak * 1024
+
+    # the file is reopened rather than copied when the metrics are sent to a spawned worker process
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["file"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.path is not None:
+            self.file = open(self.path, "a")
@@ -0,0 +1,71 @@
+import json
+import numpy as np
+from model import SparseMarkov, SparseNaiveBayes, Vocabulary
+
+
+# Saves trained vectorized models, along with the preprocessing settings they were trained with, to a compact binary
+# file, and loads them back memory-mapped so that scoring processes start in milliseconds and share the same pages.
+# A file is the MAGIC number, the length of a JSON header describing every array, the header itself, and then the
+# raw bytes of each array, aligned to ALIGNMENT bytes
+class ModelStore:
+    MAGIC = b"RTMODEL1"
+    ALIGNMENT = 64
+    # the types of model that can be stored, by name
+    MODELS = {"SparseNaiveBayes": SparseNaiveBayes.SparseNaiveBayes,
+              "SparseMarkov": SparseMarkov.SparseMarkov}
+
+    # writes the model and the settings it was trained with to the file
+    @staticmethod
+    def save(path, model, settings):
+        if type(model).__name__ not in ModelStore.MODELS:
+            raise ValueError("Only vectorized models can be saved, not " + type(model).__name__)
+        arrays = {name: np.ascontiguousarray(array) for name, array in model.getArrays().items()}
+        words = [word.encode("utf-8") for word in model.vocabulary.words]
+        arrays["vocabularyBytes"] = np.frombuffer(b"".join(words), dtype=np.uint8)
+        arrays["vocabularyOffsets"] = np.cumsum([0] + [len(word) for word in words], dtype=np.int64)
+        header = {"model": type(model).__name__, "settings": settings, "arrays": {}}
+        offset = 0
+        for name, array in arrays.items():
+            header["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+            offset = ModelStore.align(offset + array.nbytes)
+        headerBytes = json.dumps(header).encode("utf-8")
+        start = ModelStore.align(len(ModelStore.MAGIC) + 8 + len(headerBytes))
+        with open(path, "wb") as f:
+            f.write(ModelStore.MAGIC)
+            f.write(len(headerBytes).to_bytes(8, "little"))
+            f.write(headerBytes)
+            for name, array in arrays.items():
+                f.write(b"\0" * (start + header["arrays"][name]["offset"] - f.tell()))
+                f.write(array.tobytes())
+
+    # reads a model written by save, returning it along with the settings it was trained with. The count tables
+    # are memory-mapped read only, so the model can classify but not be trained further
+    @staticmethod
+    def load(path):
+        with open(path, "rb") as f:
+            if f.read(len(ModelStore.MAGIC)) != ModelStore.MAGIC:
+                raise ValueError(path + " is not a saved model")
+            length = int.from_bytes(f.read(8), "little")
+            header = json.loads(f.read(length).decode("utf-8"))
+        start = ModelStore.align(len(ModelStore.MAGIC) + 8 + length)
+        arrays = {}
+        for name, spec in header["arrays"].items():
+            shape = tuple(spec["shape"])
+            if np.prod(shape) == 0:
+                # empty arrays can't be memory-mapped
+                arrays[name] = np.zeros(shape, dtype=spec["dtype"])
+            else:
+                arrays[name] = np.memmap(path, dtype=spec["dtype"], mode="r", offset=start + spec["offset"],
+                                         shape=shape)
+        model = ModelStore.MODELS[header["model"]]()
+        blob = arrays["vocabularyBytes"].tobytes()
+        offsets = arrays["vocabularyOffsets"].tolist()
+        model.vocabulary = Vocabulary.Vocabulary.of(blob[offsets[i]:offsets[i + 1]].decode("utf-8")
+                                                    for i in range(len(offsets) - 1))
+        model.setArrays(arrays)
+        return model, header["settings"]
+
+    # returns the offset rounded up to the next multiple of ALIGNMENT
+    @staticmethod
+    def align(offset):
+        return -(-offset // ModelStore.ALIGNMENT) * ModelStore.ALIGNMENT
@@ -0,0 +1,201 @@
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from scipy import sparse
+
+
+# Runs the expectation steps of EM for a vectorized model across a persistent pool of worker processes, each of which
+# also computes the statistics its sentences add to the count tables in the maximization step. The prepared corpus,
+# the count tables of the model, the class probabilities each sentence has applied to them and the statistics of the
+# round are placed once in a block of shared memory that the workers map, so that nothing is copied between processes
+# each round. The sentences are split into a fixed number of shards however many workers there are, and the workers
+# sum the statistics of the shards in shard order, so that every round gives the same results for any number of them
+class ParallelEStep:
+    # the number of shards the sentences are split into, which is also the most workers that are kept busy, as the
+    # shards can't depend on the number of workers without the results doing so too
+    SHARDS = 16
+    # the alignment of each array within the block of shared memory
+    ALIGNMENT = 64
+
+    # model is a vectorized model already initialized on the prepared corpus, whose every part has a row per
+    # sentence, applied the (sentence x class) probabilities each sentence has added to the model, and workers the
+    # number of processes
+    def __init__(self, model, prepared, applied, workers, shards=SHARDS):
+        self.model = model
+        arrays = {"applied": np.asarray(applied, dtype=float)}
+        for name, array in model.scoringArrays().items():
+            arrays["model/" + name] = array
+        # the statistics of the shards of a round are summed in tables the shape of the count tables
+        for name, array in model.countArrays().items():
+            arrays["statistics/" + name] = np.zeros_like(array)
+        sentences = len(applied)
+        shards = max(1, min(shards, sentences))
+        # the first and last sentence of each shard
+        self.bounds = [(sentences * shard // shards, sentences * (shard + 1) // shards) for shard in range(shards)]
+        # the shape of each sparse part of the corpus, or None for the dense ones
+        self.parts = []
+        for i, part in enumerate(prepared):
+            name = "corpus/" + str(i)
+            if not sparse.issparse(part):
+                arrays[name] = np.asarray(part)
+                self.parts.append(None)
+                continue
+            part = sparse.csr_matrix(part)
+            arrays[name + "/data"] = part.data
+            arrays[name + "/indices"] = part.indices
+            arrays[name + "/indptr"] = part.indptr
+            self.parts.append(part.shape)
+            # the statistics of a shard are only computed for the terms in it, which are numbered in order for each
+            # shard as the columns of a matrix as narrow as they are
+            terms = []
+            arrays[name + "/columns"] = np.empty_like(part.indices)
+            for start, end in self.bounds:
+                first, last = part.indptr[start], part.indptr[end]
+                shardTerms, columns = np.unique(part.indices[first:last], return_inverse=True)
+                terms.append(shardTerms)
+                arrays[name + "/columns"][first:last] = columns
+            arrays[name + "/terms"] = np.concatenate(terms)
+            arrays[name + "/termptr"] = np.cumsum([0] + [len(shardTerms) for shardTerms in terms])
+        self.layout, size = self.layoutOf(arrays)
+        self.memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        self.arrays = self.views(self.memory.buf, self.layout)
+        for name, array in arrays.items():
+            self.arrays[name][...] = array
+        # the model counts in shared memory from now on, so that the workers score with every update made to it
+        model.setCountArrays({name: self.arrays["model/" + name] for name in model.countArrays()})
+        self.round = 0
+        # the number of sentences counted in the statistics of the round
+        self.changed = 0
+        # the shard whose statistics are to be summed next, which the workers wait for their turn on
+        self.turn = multiprocessing.Value("i", 0, lock=False)
+        self.condition = multiprocessing.Condition()
+        initArgs = (self.memory.name, self.layout, self.parts, type(model), self.turn, self.condition)
+        self.pool = multiprocessing.Pool(min(workers, shards), initShards, initArgs)
+
+    # scores every sentence with the current model, returning the log-likelihood of the corpus. The sentences whose
+    # class probabilities changed by more than epsilon since they were last applied are recorded as applied, and the
+    # statistics of their changes summed, to be added to the model by maximization
+    def expectation(self, epsilon):
+        self.round += 1
+        self.turn.value = 0
+        # each shard is a task of its own, as the shards after one that fails in the same chunk would never run, and
+        # the shards after those would wait for their turns forever
+        results = self.pool.starmap(runShard, [(self.round, shard, start, end, epsilon)
+                                               for shard, (start, end) in enumerate(self.bounds)], chunksize=1)
+        logLikelihood = 0.0
+        self.changed = 0
+        for shardLogLikelihood, shardChanged in results:
+            logLikelihood += shardLogLikelihood
+            self.changed += shardChanged
+        return logLikelihood
+
+    # adds the statistics summed by the last expectation to the model, returning the number of sentences they count
+    def maximization(self):
+        sums = {name: self.arrays["statistics/" + name] for name in self.model.countArrays()}
+        self.model.addStatistics({name: (None, values) for name, values in sums.items()})
+        for values in sums.values():
+            values[...] = 0.0
+        return self.changed
+
+    # stops the workers, moves the counts of the model back out of shared memory and frees it
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+        self.model.setCountArrays({name: np.array(array) for name, array in self.model.countArrays().items()})
+        # every view of the block has to be released before it can be closed
+        self.arrays = None
+        self.memory.close()
+        self.memory.unlink()
+
+    # returns the offset and shape of each of the arrays within a block of shared memory, along with its size
+    @staticmethod
+    def layoutOf(arrays):
+        layout = {}
+        offset = 0
+        for name, array in arrays.items():
+            layout[name] = (array.dtype.str, array.shape, offset)
+            offset += -(-array.nbytes // ParallelEStep.ALIGNMENT) * ParallelEStep.ALIGNMENT
+        return layout, offset
+
+    # returns a view of each array of the layout in the buffer
+    @staticmethod
+    def views(buffer, layout):
+        return {name: np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+                for name, (dtype, shape, offset) in layout.items()}
+
+    # returns the rows from start to end of the prepared corpus in shared memory, without copying them. If shard is
+    # given they are those of the shard, whose sparse parts are returned with the columns of the terms in it instead,
+    # along with those terms
+    @staticmethod
+    def shardOf(arrays, parts, start, end, shard=None):
+        corpus = []
+        terms = []
+        for i, shape in enumerate(parts):
+            name = "corpus/" + str(i)
+            if shape is None:
+                corpus.append(arrays[name][start:end])
+                terms.append(None)
+                continue
+            indptr = arrays[name + "/indptr"]
+            first, last = indptr[start], indptr[end]
+            if shard is None:
+                columns = arrays[name + "/indices"]
+                terms.append(None)
+            else:
+                columns = arrays[name + "/columns"]
+                termptr = arrays[name + "/termptr"]
+                terms.append(arrays[name + "/terms"][termptr[shard]:termptr[shard + 1]])
+            width = shape[1] if shard is None else len(terms[-1])
+            corpus.append(sparse.csr_matrix((arrays[name + "/data"][first:last], columns[first:last],
+                                             indptr[start:end + 1] - first), shape=(end - start, width)))
+        return tuple(corpus) if shard is None else (tuple(corpus), tuple(terms))
+
+
+# the block of shared memory, the views of it, the layout of the corpus, the model scoring with the shared counts, the
+# turn and condition the statistics of the shards are summed in order with, and the round the log tables of the model
+# were computed for, in a worker process
+shardState = None
+
+
+# sets up a worker process, mapping the block of shared memory and creating a model of the type that scores with the
+# counts in it
+def initShards(name, layout, parts, modelType, turn, condition):
+    global shardState
+    memory = shared_memory.SharedMemory(name=name)
+    arrays = ParallelEStep.views(memory.buf, layout)
+    model = modelType()
+    model.setScoringArrays({name[len("model/"):]: array for name, array in arrays.items() if name.startswith("model/")})
+    shardState = [memory, arrays, parts, model, turn, condition, 0]
+
+
+# scores the sentences of a shard with the model of the round, recording those whose class probabilities changed by
+# more than epsilon since they were last applied as applied, and adding the statistics of their changes to the sums of
+# the round once those of the shards before it have been. Returns the log-likelihood of the sentences and the number
+# of them that changed
+def runShard(round, shard, start, end, epsilon):
+    memory, arrays, parts, model, turn, condition, lastRound = shardState
+    if round != lastRound:
+        # the counts have changed since the log tables were computed
+        model.logTables = {}
+        shardState[6] = round
+    statistics = None
+    try:
+        prepared = ParallelEStep.shardOf(arrays, parts, start, end)
+        probs, logLikelihood = model.scoreAll(prepared)
+        applied = arrays["applied"][start:end]
+        delta = probs - applied
+        changed = np.flatnonzero(np.abs(delta).max(axis=1) > epsilon)
+        compact, terms = ParallelEStep.shardOf(arrays, parts, start, end, shard)
+        statistics = model.statistics(model.select(compact, changed), delta[changed], terms)
+        applied[changed] = probs[changed]
+    finally:
+        # the turn passes on even if the shard failed, so that the shards after it don't wait for it forever and the
+        # failure reaches the main process
+        sums = {name[len("statistics/"):]: array for name, array in arrays.items() if name.startswith("statistics/")}
+        with condition:
+            condition.wait_for(lambda: turn.value == shard)
+            if statistics is not None:
+                model.addToTables(sums, statistics)
+            turn.value += 1
+            condition.notify_all()
+    return logLikelihood, len(changed)
@@ -16,65 +16,303 @@
 # than in the general population - and categorize the new utterances.
 
 import argparse
+import cProfile
+import copy
+import itertools
+import multiprocessing
+import os
+import pstats
 import random
+import time
+import numpy as np
+import ClassificationService
+import Corpus
+import CorpusReader
 import Lemmatizer
-import Sentence
+import Metrics
 from model import NaiveBayes
 from model import Markov
 
 
 class RottenTomatoesClassifier:
-    # The number of CLASSES to train the data to
+    # The number of CLASSES to train the data to. Sentences seeded as negative start in the first class and those
+    # seeded as positive in the last, so that with more than two classes the ones between form a graded scale
     CLASSES = 2
 
+    # the file the training sentences and test section are read from, either in the format of trainEMsemisup.txt
+    # or Kaggle's train.tsv (optionally zipped)
+    training_file = "trainEMsemisup.txt"
     # whether to consider the semi-supervised data in the file, or to do a completely unsupervised run
     semi_supervised = True
     # whether to lemmatize the input sentences
     lemmatize = True
+    # the tokenizer sentences are split into words with before they are lemmatized, either "nltk" or the faster "regex"
+    tokenizer = "nltk"
+    # the file lemmas are memoized in across runs, or an empty string to only memoize them in memory
+    lemma_cache = "lemmaCache.json"
+    # the number of processes the sentences are lemmatized in
+    workers = 1
     # whether to perform the algorithm on a fixed seed for Random
     fixed_seed = False
+    # the seed Random is given when fixed_seed is set, which is offset by the chain number for each restart
+    SEED = 2019
+    # the number of independently seeded EM chains, trained in parallel processes, of which the one reaching the
+    # highest log-likelihood is kept
+    restarts = 1
+    # the number of worker processes each round of batch EM is spread across, sharing the corpus and the
+    # counts of the vectorized model with this process, or 0 to run them in this process
+    em_workers = 0
+    # the number of buckets the dict models hash unigrams and bigrams into, or 0 to count each of them by itself
+    hash_buckets = 0
+    # the expected count summed over every class below which unigrams and bigrams are pruned from the dict models
+    # after each EM round, or 0 to keep them all
+    prune_below = 0.0
+    # the number of sentences streamed into each step of online (stepwise) EM, or 0 to run batch EM over the whole
+    # corpus held in memory
+    mini_batch = 0
+    # how fast the step size of online EM decays, the step after k batches being (k + 2) ^ -step_decay
+    step_decay = 0.7
     # the number of iterations the Expectation-Maximization algorithm will perform
     iterations = 200
     # the number of words/bigrams that are printed per class
     top_words = 10
     # whether to use the Naive Bayes model or the Markov model of bigrams
     naive_bayes = True
+    # whether to use the vectorized sparse matrix models instead of the dict based models
+    vectorized = False
+    # the relative log-likelihood gain below which an EM round counts as converged, or None to always run every
+    # iteration
+    tolerance = None
+    # the number of consecutive converged EM rounds after which training stops early
+    patience = 1
+    # the largest change in a sentence's class probabilities that is left out of the maximization step
+    update_epsilon = 0.0
+    # the file the trained model is saved to, or None to not save it
+    save_model = None
+    # the file a previously trained model is loaded from instead of training one, or None to train one
+    load_model = None
+    # where sentences are streamed from to be classified by a long-running service ("stdin" or "http"), or None to
+    # classify the test sentences of the training file
+    serve = None
+    # the local port the HTTP classification service listens on
+    port = 8080
+    # the most sentences the classification service scores together
+    batch_size = 64
+    # the most milliseconds the classification service waits for a batch to fill
+    batch_wait_ms = 5.0
+    # the file the metrics of each stage of the run are appended to as JSON lines, or None to not record them
+    metrics_file = None
+    # whether the metrics also record the peak memory allocated by Python during each stage
+    trace_memory = False
+    # the file the cProfile stats of the run are dumped to, or None to not profile it
+    profile = None
+    # the number of the most expensive functions printed after a profiled run
+    PROFILE_LINES = 25
     # the current model being used
     model = NaiveBayes.NaiveBayes()
+    # the lemmatizer shared by the training and test sentences
+    lemmatizer = None
+    # the reader the training sentences and test section are streamed from
+    reader = None
+    # the metrics of the run, which record nothing unless a metrics file was chosen
+    metrics = Metrics.Metrics()
 
     # runs necessary steps to classify the rotten tomatoes data
     def run(self):
-        self.parseArgs()
-        sentences = self.getTrainingData()
-        lemmatizedSentences = Lemmatizer.Lemmatizer().lemmatize(self.lemmatize, sentences)
-        self.trainModels(lemmatizedSentences)
-        self.model.printTopWords(self.top_words)
-        self.classifySentences()
+        args = self.parseArgs()
+        self.metrics = Metrics.Metrics(self.metrics_file, self.trace_memory)
+        self.metrics.record("settings", **vars(args))
+        if self.profile is None:
+            self.runStages()
+        else:
+            profiler = cProfile.Profile()
+            profiler.runcall(self.runStages)
+            profiler.dump_stats(self.profile)
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(self.PROFILE_LINES)
+        self.metrics.close()
+
+    # trains the model or loads a saved one, then classifies the test sentences with it
+    def runStages(self):
+        with self.metrics.stage("run"):
+            self.reader = CorpusReader.CorpusReader(self.training_file)
+            self.lemmatizer = Lemmatizer.Lemmatizer(self.lemma_cache or None, self.workers, tokenizer=self.tokenizer)
+            if self.load_model is not None:
+                # classify-only mode, which skips straight to scoring with the loaded model
+                self.loadModel()
+            else:
+                self.train()
+            self.classifyOrServe()
+
+    # trains the model and prints its top words, saving it first if requested
+    def train(self):
+        with self.metrics.stage("train"):
+            if self.mini_batch > 0:
+                self.trainOnline(random.Random(self.SEED) if self.fixed_seed else random)
+            else:
+                # the sentences are lemmatized as they are read and interned as they are lemmatized
+                self.trainModels(self.lemmatizer.lemmatizeStream(self.lemmatize, self.reader.trainingSentences()))
+        size = self.model.memorySize()
+        print("Model memory: " + self.formatBytes(size))
+        self.metrics.record("model", modelBytes=size)
+        if self.save_model is not None:
+            self.saveModel()
+        with self.metrics.stage("topWords", topWords=self.top_words):
+            self.model.printTopWords(self.top_words)
+
+    # classifies the test sentences, or serves classifications of streamed sentences if a service was requested
+    def classifyOrServe(self):
+        if self.serve is None:
+            self.classifySentences()
+            return
+        service = ClassificationService.ClassificationService(self.model, self.lemmatizer, self.lemmatize,
+                                                              self.batch_size, self.batch_wait_ms / 1000)
+        if self.serve == "http":
+            service.serveHttp(self.port)
+        else:
+            service.serveLines()
+        self.metrics.record("serve", **service.stats())
 
     # parses command line arguments
     def parseArgs(self):
         parser = argparse.ArgumentParser()
+        parser.add_argument("-d", "--trainingFile", type=str, default="trainEMsemisup.txt")
         parser.add_argument("-s", "--semiSupervised", type=self.strToBool, default=True)
         parser.add_argument("-l", "--lemmatize", type=self.strToBool, default=True)
+        parser.add_argument("--tokenizer", choices=Lemmatizer.Lemmatizer.TOKENIZERS, default="nltk")
+        parser.add_argument("--lemmaCache", type=str, default="lemmaCache.json")
+        parser.add_argument("-w", "--workers", type=int, default=1)
         parser.add_argument("-f", "--fixedSeed", type=self.strToBool, default=False)
         parser.add_argument("-i", "--iterations", type=int, default=200)
+        parser.add_argument("-k", "--classes", type=int, default=2)
+        parser.add_argument("-r", "--restarts", type=int, default=1)
+        parser.add_argument("-b", "--miniBatch", type=int, default=0)
+        parser.add_argument("--emWorkers", type=int, default=0)
+        parser.add_argument("--hashBuckets", type=int, default=0)
+        parser.add_argument("--pruneBelow", type=float, default=0.0)
+        parser.add_argument("--stepDecay", type=float, default=0.7)
         parser.add_argument("-t", "--topWords", type=int, default=10)
         parser.add_argument("-n", "--naiveBayes", type=self.strToBool, default=True)
+        parser.add_argument("-v", "--vectorized", type=self.strToBool, default=False)
+        parser.add_argument("--tolerance", type=float, default=None)
+        parser.add_argument("--patience", type=int, default=1)
+        parser.add_argument("-e", "--updateEpsilon", type=float, default=0.0)
+        parser.add_argument("--saveModel", type=str, default=None)
+        parser.add_argument("--loadModel", type=str, default=None)
+        parser.add_argument("--serve", choices=["stdin", "http"], default=None)
+        parser.add_argument("--port", type=int, default=8080)
+        parser.add_argument("--batchSize", type=int, default=64)
+        parser.add_argument("--batchWaitMs", type=float, default=5.0)
+        parser.add_argument("--metrics", type=str, default=None)
+        parser.add_argument("--traceMemory", type=self.strToBool, default=False)
+        parser.add_argument("--profile", type=str, default=None)
 
         args = parser.parse_args()
+        if args.trainingFile is not None:
+            self.training_file = args.trainingFile
         if args.semiSupervised is not None:
             self.semi_supervised = args.semiSupervised
         if args.lemmatize is not None:
             self.lemmatize = args.lemmatize
+        if args.tokenizer is not None:
+            self.tokenizer = args.tokenizer
+        if args.lemmaCache is not None:
+            self.lemma_cache = args.lemmaCache
+        if args.workers is not None and args.workers > 0:
+            self.workers = args.workers
         if args.fixedSeed is not None:
             self.fixed_seed = args.fixedSeed
         if args.iterations is not None and args.iterations > 0:
             self.iterations = args.iterations
+        if args.classes is not None:
+            self.CLASSES = args.classes
+        if args.emWorkers is not None and args.emWorkers >= 0:
+            self.em_workers = args.emWorkers
+        if args.restarts is not None and args.restarts > 0:
+            self.restarts = args.restarts
+        if args.hashBuckets is not None and args.hashBuckets >= 0:
+            self.hash_buckets = args.hashBuckets
+        if args.pruneBelow is not None and args.pruneBelow >= 0:
+            self.prune_below = args.pruneBelow
+        if args.miniBatch is not None and args.miniBatch >= 0:
+            self.mini_batch = args.miniBatch
+        if args.stepDecay is not None:
+            self.step_decay = args.stepDecay
         if args.topWords is not None and args.topWords > 0:
             self.top_words = args.topWords
         if args.naiveBayes is not None:
             self.naive_bayes = args.naiveBayes
-            self.model = NaiveBayes.NaiveBayes() if args.naiveBayes else Markov.Markov()
+        if args.vectorized is not None:
+            self.vectorized = args.vectorized
+        if args.tolerance is not None and args.tolerance >= 0:
+            self.tolerance = args.tolerance
+        if args.patience is not None and args.patience > 0:
+            self.patience = args.patience
+        if args.updateEpsilon is not None and args.updateEpsilon >= 0:
+            self.update_epsilon = args.updateEpsilon
+        self.save_model = args.saveModel
+        self.load_model = args.loadModel
+        self.serve = args.serve
+        if args.port is not None and args.port >= 0:
+            self.port = args.port
+        if args.batchSize is not None and args.batchSize > 0:
+            self.batch_size = args.batchSize
+        if args.batchWaitMs is not None and args.batchWaitMs >= 0:
+            self.batch_wait_ms = args.batchWaitMs
+        self.metrics_file = args.metrics
+        if args.traceMemory is not None:
+            self.trace_memory = args.traceMemory
+        self.profile = args.profile
+        if self.save_model is not None and not self.vectorized:
+            parser.error("--saveModel requires --vectorized True")
+        if (self.hash_buckets > 0 or self.prune_below > 0) and self.vectorized:
+            parser.error("--hashBuckets and --pruneBelow require --vectorized False")
+        if self.mini_batch > 0 and self.restarts > 1:
+            parser.error("--restarts can't be combined with --miniBatch")
+        if self.em_workers > 0 and not self.vectorized:
+            parser.error("--emWorkers requires --vectorized True")
+        if self.em_workers > 0 and (self.restarts > 1 or self.mini_batch > 0):
+            parser.error("--emWorkers can't be combined with --restarts or --miniBatch")
+        if not 0.5 < self.step_decay <= 1.0:
+            parser.error("--stepDecay must be in (0.5, 1]")
+        if self.CLASSES < 2:
+            parser.error("--classes must be at least 2")
+        self.model = self.createModel()
+        return args
+
+    # creates an untrained model of the chosen type
+    def createModel(self):
+        if self.vectorized:
+            # the vectorized models, and the modules that use them, are only imported when they are used, as they
+            # import scipy, which would slow down starting the dict models
+            from model import SparseMarkov, SparseNaiveBayes
+            if self.naive_bayes:
+                return SparseNaiveBayes.SparseNaiveBayes(self.CLASSES)
+            return SparseMarkov.SparseMarkov(self.CLASSES)
+        model = NaiveBayes.NaiveBayes(self.CLASSES) if self.naive_bayes else Markov.Markov(self.CLASSES)
+        model.buckets = self.hash_buckets
+        return model
+
+    # saves the trained model along with the settings needed to preprocess sentences for it
+    def saveModel(self):
+        settings = {"lemmatize": self.lemmatize, "tokenizer": self.tokenizer, "naiveBayes": self.naive_bayes}
+        import ModelStore
+        with self.metrics.stage("saveModel"):
+            ModelStore.ModelStore.save(self.save_model, self.model, settings)
+        print("Saved model to " + self.save_model)
+
+    # loads a saved model, adopting the settings it was trained with
+    def loadModel(self):
+        import ModelStore
+        with self.metrics.stage("loadModel"):
+            self.model, settings = ModelStore.ModelStore.load(self.load_model)
+        self.lemmatize = settings["lemmatize"]
+        # models saved before the tokenizer could be chosen were all tokenized by NLTK
+        self.tokenizer = settings.get("tokenizer", "nltk")
+        self.lemmatizer.tokenizer = self.tokenizer
+        self.naive_bayes = settings["naiveBayes"]
+        self.CLASSES = self.model.classes
+        self.vectorized = True
+        print("Loaded model from " + self.load_model)
 
     # custom boolean operator type for argparse
     @staticmethod
@@ -89,105 +327,297 @@ class RottenTomatoesClassifier:
         else:
             raise argparse.ArgumentTypeError('Boolean value expected.')
 
-    # parses the training data
+    # splits the lines into lists of up to size lines as they are read
     @staticmethod
-    def getTrainingData():
-        with open("trainEMsemisup.txt") as f:
-            sentences = []
-            lines = f.readlines()
-            for line in lines:
-                line = line.strip()
-                if line:
-                    if line[:3] == "---":
-                        return sentences
-                    else:
-                        sentences.append(line)
-        f.close()
-        return sentences
+    def miniBatches(lines, size):
+        lines = iter(lines)
+        batch = list(itertools.islice(lines, size))
+        while batch:
+            yield batch
+            batch = list(itertools.islice(lines, size))
+
+    # streams the training sentences in mini-batches, lemmatized and interned into corpora along with their prepared
+    # form. Only one mini-batch is held at a time
+    def streamTrainingData(self):
+        for lines in self.miniBatches(self.reader.trainingSentences(), self.mini_batch):
+            corpus = Corpus.Corpus.of(self.lemmatizer.lemmatize(self.lemmatize, lines, False), self.model.vocabulary)
+            yield corpus, self.model.prepare(corpus)
 
     # applies the Expectation-Maximization algorithm on the chosen model
     def trainModels(self, sentences):
         # We'll start by assigning the sentences to random CLASSES.
         # 1.0 for the random class, 0.0 for everything else
         print("Initializing models....")
-        naiveCLASSES = self.randomInit(sentences)
-        # Initialize the parameters by training as if init were
-        # the ground truth (essentially starting with M step)
-        for key, value in naiveCLASSES.items():
-            self.model.update(key, value)
+        lemmatizeSeconds = self.lemmatizer.seconds
+        with self.metrics.stage("preprocess") as stage:
+            corpus = Corpus.Corpus.of(sentences, self.model.vocabulary)
+            prepared = self.model.prepare(corpus)
+            stage["sentences"] = len(corpus)
+            stage["lemmatizeSeconds"] = self.lemmatizer.seconds - lemmatizeSeconds
+        if self.restarts > 1:
+            self.trainRestarts(corpus, prepared)
+        else:
+            self.expectationMaximization(corpus, prepared, random.Random(self.SEED) if self.fixed_seed else random)
 
-        # for a set number of iterations, performs the expectation and maximization steps to update the model
+    # trains the model from restarts independently seeded random initializations, each in a forked worker process
+    # that inherits the prepared corpus from this one rather than being sent a copy of it, and keeps the model of the
+    # chain that reached the highest log-likelihood. Where processes can't be forked the chains are trained one after
+    # another in this process, as the classifier, whose lemmatizer pool can't be pickled, would have to be sent to
+    # spawned ones
+    def trainRestarts(self, corpus, prepared):
+        if self.fixed_seed:
+            seeds = [self.SEED + chain for chain in range(self.restarts)]
+        else:
+            seeds = [random.randrange(2 ** 32) for chain in range(self.restarts)]
+        print("Training " + str(self.restarts) + " EM chains....")
+        start = time.perf_counter()
+        processes = min(self.restarts, os.cpu_count() or 1)
+        if "fork" in multiprocessing.get_all_start_methods():
+            with multiprocessing.get_context("fork").Pool(processes, initChain, (self, corpus, prepared)) as pool:
+                results = pool.starmap(trainChain, enumerate(seeds))
+        else:
+            initChain(self, corpus, prepared)
+            results = []
+            for chain, seed in enumerate(seeds):
+                model, logLikelihood, rounds, seconds = trainChain(chain, seed)
+                # the next chain resets the model in place
+                results.append((copy.deepcopy(model), logLikelihood, rounds, seconds))
+            self.metrics.fields.pop("chain")
+        best = None
+        for chain, (model, logLikelihood, rounds, seconds) in enumerate(results):
+            print("Chain " + str(chain) + ": " + str(rounds) + " EM rounds in " + "%.2f" % seconds
+                  + "s, log-likelihood " + str(logLikelihood))
+            self.metrics.record("chain", chain=chain, rounds=rounds, seconds=seconds, logLikelihood=logLikelihood)
+            if best is None or logLikelihood > results[best][1]:
+                best = chain
+        self.model = results[best][0]
+        print("Kept chain " + str(best) + " of " + str(self.restarts) + " trained in "
+              + "%.2f" % (time.perf_counter() - start) + "s")
+
+    # trains the model on a prepared corpus from a random initialization drawn from rand, returning the last
+    # log-likelihood of the data and the number of EM rounds run
+    def expectationMaximization(self, corpus, prepared, rand, verbose=True):
+        with self.metrics.stage("initialize", sentences=len(corpus)):
+            # the probabilities of each sentence belonging to each class, a row per sentence of the corpus
+            classes = self.randomInit(corpus, rand)
+            # Initialize the parameters by training as if init were
+            # the ground truth (essentially starting with M step)
+            self.model.updateAll(prepared, classes)
+        # the class probabilities each sentence currently contributes to the model
+        applied = np.array(classes)
+        if self.em_workers <= 0:
+            return self.emRounds(corpus, prepared, applied, None, verbose)
+        import ParallelEStep
+        # the rounds are spread across workers that share the corpus and the model with this process
+        parallel = ParallelEStep.ParallelEStep(self.model, prepared, applied, self.em_workers)
+        try:
+            return self.emRounds(corpus, prepared, applied, parallel, verbose)
+        finally:
+            parallel.close()
+
+    # runs EM rounds on the model initialized from the applied class probabilities of each sentence of a prepared
+    # corpus, in this process or across the workers of parallel if it isn't None, returning the last log-likelihood
+    # of the data and the number of EM rounds run
+    def emRounds(self, corpus, prepared, applied, parallel, verbose):
+        # for a set number of iterations, performs the expectation and maximization steps to update the model,
+        # stopping early once the log-likelihood of the data has stopped improving for patience rounds
+        logLikelihood = None
+        convergedRounds = 0
         i = 0
         while i < self.iterations:
-            print("EM round " + str(i))
-            classes = {}
             # expectation step
-            for sentence in sentences:
-                classes[sentence] = self.model.classify(sentence)
-            # maximization step
-            self.model = NaiveBayes.NaiveBayes() if self.naive_bayes else Markov.Markov()
-            for key, value in classes.items():
-                self.model.update(key, value)
+            with self.metrics.stage("expectation", round=i, sentences=len(corpus)) as stage:
+                if parallel is None:
+                    classes, newLogLikelihood = self.model.scoreAll(prepared)
+                else:
+                    newLogLikelihood = parallel.expectation(self.update_epsilon)
+                stage["logLikelihood"] = newLogLikelihood
+            if verbose:
+                print("EM round " + str(i) + ", log-likelihood " + str(newLogLikelihood))
+            if self.hasConverged(logLikelihood, newLogLikelihood):
+                convergedRounds += 1
+                if convergedRounds >= self.patience:
+                    if verbose:
+                        print("Converged after " + str(i) + " EM rounds")
+                    return newLogLikelihood, i
+            else:
+                convergedRounds = 0
+            logLikelihood = newLogLikelihood
+            # maximization step, which only moves the model by the change in the class probabilities of each
+            # sentence, skipping the sentences whose probabilities have barely changed since they were applied
+            with self.metrics.stage("maximization", round=i) as stage:
+                if parallel is None:
+                    delta = np.asarray(classes) - applied
+                    changed = np.flatnonzero(np.abs(delta).max(axis=1) > self.update_epsilon)
+                    self.model.updateAll(self.model.select(prepared, changed), delta[changed])
+                    applied[changed] = np.asarray(classes)[changed]
+                    stage["sentences"] = len(changed)
+                else:
+                    stage["sentences"] = parallel.maximization()
+            if self.prune_below > 0:
+                self.pruneModel(self.prune_below, verbose)
             i += 1
+        return logLikelihood, i
 
-    #  randomly initializes the unsupervised data based on semi_supervised, CLASSES, and rng
-    def randomInit(self, sentences):
-        rand = random.seed(2019) if self.fixed_seed else random
-        counts = {}
-        for sentence in sentences:
-            probs = []
-            if self.semi_supervised and sentence.words[:2] == ":)":
-                # class 1 = positive
-                probs.append(0.0)
-                probs.append(1.0)
-                sentence = Sentence.Sentence(sentence.words[3:], sentence.lemmas[4:])
-            elif self.semi_supervised and sentence.words[:2] == ":(":
-                # class 0 = negative
-                probs.append(1.0)
-                probs.append(0.0)
-                sentence = Sentence.Sentence(sentence.words[3:], sentence.lemmas[4:])
+    # trains the model with online (stepwise) EM, streaming the training data in mini-batches so that neither the
+    # corpus nor the class probabilities of all its sentences are held at once. A first pass initializes the model
+    # from the random classes of every sentence, as batch EM does. Every later pass runs an expectation step on each
+    # mini-batch, then moves the counts of the model a step of (k + 2) ^ -step_decay (after k steps) of the way
+    # towards the counts expected from the mini-batch, scaled up to the size of the corpus
+    def trainOnline(self, rand):
+        print("Initializing models....")
+        size = 0
+        lemmatizeSeconds = self.lemmatizer.seconds
+        with self.metrics.stage("initialize") as stage:
+            for corpus, prepared in self.streamTrainingData():
+                self.model.updateAll(prepared, self.randomInit(corpus, rand))
+                size += len(corpus)
+            stage["sentences"] = size
+            stage["lemmatizeSeconds"] = self.lemmatizer.seconds - lemmatizeSeconds
+        # the counts held by the model are its true counts divided by scale, so that the shrinking of every count
+        # by each step is a single multiplication rather than a pass over the whole model
+        scale = 1.0
+        steps = 0
+
+        # for a set number of passes over the data, stopping early once the log-likelihood of the data has stopped
+        # improving for patience passes
+        logLikelihood = None
+        convergedRounds = 0
+        i = 0
+        while i < self.iterations:
+            newLogLikelihood = 0.0
+            lemmatizeSeconds = self.lemmatizer.seconds
+            with self.metrics.stage("onlineRound", round=i, sentences=size) as stage:
+                for corpus, prepared in self.streamTrainingData():
+                    # expectation step
+                    classes, batchLogLikelihood = self.model.scoreAll(prepared)
+                    newLogLikelihood += batchLogLikelihood
+                    # maximization step, true counts = (1 - step) * true counts + step * expected counts
+                    step = (steps + 2) ** -self.step_decay
+                    scale *= 1.0 - step
+                    weight = step * size / len(corpus) / scale
+                    self.model.updateAll(prepared, np.asarray(classes) * weight)
+                    steps += 1
+                    if scale < 1e-100:
+                        # folds the scale into the counts before the weights of new counts overflow
+                        self.model.scale(scale)
+                        scale = 1.0
+                stage["logLikelihood"] = newLogLikelihood
+                stage["lemmatizeSeconds"] = self.lemmatizer.seconds - lemmatizeSeconds
+            print("EM round " + str(i) + ", log-likelihood " + str(newLogLikelihood))
+            if self.prune_below > 0:
+                # the counts held by the model are scaled down by scale
+                self.pruneModel(self.prune_below / scale)
+            if self.hasConverged(logLikelihood, newLogLikelihood):
+                convergedRounds += 1
+                if convergedRounds >= self.patience:
+                    print("Converged after " + str(i) + " EM rounds")
+                    break
             else:
-                baseline = 1.0 / self.CLASSES
-                # slight deviation to break symmetry
-                randomBumpedClass = rand.randrange(0, self.CLASSES)
-                bump = 1.0 / self.CLASSES * 0.25
-                if self.semi_supervised:
-                    bump = 0.0
-                i = 0
-                while i < self.CLASSES:
-                    if (i == randomBumpedClass):
-                        probs.append(baseline + bump)
-                    else:
-                        probs.append(baseline - bump / (self.CLASSES - 1))
-                    i += 1
-            counts[sentence] = probs
-        return counts
+                convergedRounds = 0
+            logLikelihood = newLogLikelihood
+            i += 1
+        self.model.scale(scale)
+
+    # prunes the unigrams and bigrams counted less than minCount times from the model, printing how many were
+    # removed and the memory the model took before and after if verbose is set
+    def pruneModel(self, minCount, verbose=True):
+        before = self.model.memorySize() if verbose else 0
+        with self.metrics.stage("prune") as stage:
+            stage["removed"] = self.model.prune(minCount)
+        if verbose:
+            after = self.model.memorySize()
+            print("Pruned " + str(stage["removed"]) + " terms, model memory " + self.formatBytes(before) + " -> "
+                  + self.formatBytes(after))
+            self.metrics.record("model", modelBytesBeforePruning=before, modelBytes=after)
+
+    # returns the number of bytes in megabytes
+    @staticmethod
+    def formatBytes(size):
+        return "%.2f MB" % (size / 2 ** 20)
+
+    # whether an EM round that took the log-likelihood of the data from previous to current gained less than the
+    # tolerance, relative to the size of the log-likelihood
+    def hasConverged(self, previous, current):
+        if self.tolerance is None or previous is None:
+            return False
+        return current - previous < self.tolerance * abs(previous)
+
+    #  randomly initializes the unsupervised data based on semi_supervised, CLASSES, and rand, returning a
+    #  (sentence x class) array of initial class probabilities for the corpus. The bumped class of each unseeded
+    #  sentence is drawn from rand in sentence order, then the whole array is filled in at once
+    def randomInit(self, corpus, rand):
+        labels = np.array(corpus.labels, dtype=np.int64)
+        seeded = labels >= 0 if self.semi_supervised else np.zeros(len(labels), dtype=bool)
+        unseeded = np.flatnonzero(~seeded)
+        baseline = 1.0 / self.CLASSES
+        # slight deviation to break symmetry
+        randomBumpedClasses = [rand.randrange(0, self.CLASSES) for s in unseeded]
+        bump = 1.0 / self.CLASSES * 0.25
+        if self.semi_supervised and self.CLASSES == 2 and self.restarts <= 1:
+            # the seeds break the symmetry between the first and last classes, but not between any in between. Restarts
+            # still bump the unseeded sentences, as without it every chain would start from the same probabilities
+            bump = 0.0
+        probs = np.zeros((len(labels), self.CLASSES))
+        probs[unseeded] = baseline - bump / (self.CLASSES - 1)
+        probs[unseeded, randomBumpedClasses] = baseline + bump
+        # negative seeds (label 0) start in the first class and positive seeds (label 1) in the last
+        probs[np.flatnonzero(seeded), labels[seeded] * (self.CLASSES - 1)] = 1.0
+        return probs
 
     # classifies the sentences
     def classifySentences(self):
         print("Classifying test sentences")
-        onTestingData = False
-        with open("trainEMsemisup.txt") as f:
-            lines = f.readlines()
-            for i, line in enumerate(lines):
-                line = line.strip()
-                if line:
-                    if onTestingData:
-                        if line == "Negative:" or line == "Positive:":
-                            print(line)
-                        else:
-                            lemmaLine = Lemmatizer.Lemmatizer().lemmatizeSingleton(self.lemmatize, line)
-                            print(lemmaLine.lemmas + ": ", end='')
-                            probs = self.model.classify(lemmaLine)
-                            c = 0
-                            while c < self.CLASSES:
-                                print(str(probs[c]) + " ", end='')
-                                c += 1
-                            print()
-                    elif line[:3] == "---":
-                        onTestingData = True
-        print("Class 1: Negative, Class 2: Positive")
-        f.close()
+        lemmatizeSeconds = self.lemmatizer.seconds
+        with self.metrics.stage("classify") as stage:
+            lines = self.reader.testSentences()
+            # lemmatizes every test sentence at once so that they can be spread across the workers
+            testLines = [line for line in lines if line != "Negative:" and line != "Positive:"]
+            lemmaLines = iter(self.lemmatizer.lemmatize(self.lemmatize, testLines))
+            for line in lines:
+                if line == "Negative:" or line == "Positive:":
+                    print(line)
+                else:
+                    lemmaLine = next(lemmaLines)
+                    print(lemmaLine.lemmas + ": ", end='')
+                    probs = self.model.classify(lemmaLine)
+                    c = 0
+                    while c < self.CLASSES:
+                        print(str(probs[c]) + " ", end='')
+                        c += 1
+                    print()
+            stage["sentences"] = len(testLines)
+            stage["lemmatizeSeconds"] = self.lemmatizer.seconds - lemmatizeSeconds
+        print("Class 1: Negative, Class " + str(self.CLASSES) + ": Positive")
+        self.lemmatizer.close()
+
+
+# the classifier, corpus and prepared corpus shared by the EM chains of a worker process
+chainState = None
+
+
+# sets up a worker process to train EM chains. When worker processes are forked the state is inherited rather
+# than copied to them
+def initChain(classifier, corpus, prepared):
+    global chainState
+    chainState = (classifier, corpus, prepared)
+
+
+# trains an EM chain from the seed on the classifier's model, reset so that it doesn't carry over the counts of a
+# previous chain, returning the trained model, the log-likelihood of the data under it, the number of EM rounds run
+# and the seconds they took
+def trainChain(chain, seed):
+    classifier, corpus, prepared = chainState
+    # tags the metrics the chain records with it
+    classifier.metrics.fields["chain"] = chain
+    start = time.perf_counter()
+    classifier.model.reset()
+    logLikelihood, rounds = classifier.expectationMaximization(corpus, prepared, random.Random(seed), False)
+    if rounds >= classifier.iterations:
+        # the last log-likelihood was scored before the last maximization step, which the model has had since, so the
+        # chains are compared on a score of the model returned instead. A chain that converged wasn't updated after it
+        logLikelihood = classifier.model.scoreAll(prepared)[1]
+    return classifier.model, logLikelihood, rounds, time.perf_counter() - start
 
 
 # entry point for the application
@@ -0,0 +1,161 @@
+import argparse
+import itertools
+import multiprocessing
+import os
+import random
+import sys
+import time
+import tracemalloc
+import numpy as np
+import Corpus
+import CorpusReader
+import Lemmatizer
+import RottenTomatoesClassifier
+
+
+# Trains and evaluates a grid of configurations of the classifier on the same training file, so that settings can be
+# compared without launching RottenTomatoesClassifier.py for each combination. The file is read and lemmatized once
+# for each lemmatize setting of the grid, then the configurations are trained concurrently in a pool of processes
+# that share the lemmatized sentences, and a table of the accuracy of each on the labelled test section, along with
+# how long it took and how much memory its model takes, is printed
+class Sweep:
+    # the settings of a configuration, in the order of the table's columns
+    SETTINGS = ["lemmatize", "semiSupervised", "naiveBayes", "vectorized", "iterations", "outOfVocabProb"]
+
+    # grid is the values of each setting to sweep over, by name. The other arguments are as the options of
+    # RottenTomatoesClassifier.py of the same names, processes is the number of configurations trained at once, and
+    # traceMemory also measures the peak memory allocated by Python while training each configuration, which slows
+    # the dict models down considerably
+    def __init__(self, grid, trainingFile="trainEMsemisup.txt", tokenizer="nltk", lemmaCache=None, workers=1,
+                 fixedSeed=True, processes=1, traceMemory=False):
+        self.grid = grid
+        self.trainingFile = trainingFile
+        self.tokenizer = tokenizer
+        self.lemmaCache = lemmaCache
+        self.workers = workers
+        self.fixedSeed = fixedSeed
+        self.processes = processes
+        self.traceMemory = traceMemory
+
+    # returns every configuration of the grid, as a dict of the value of each setting, grouped by lemmatize setting
+    def configurations(self):
+        values = [self.grid[name] for name in self.SETTINGS]
+        return [dict(zip(self.SETTINGS, combination)) for combination in itertools.product(*values)]
+
+    # reads the training sentences and the labelled test sentences of the file, lemmatized as each lemmatize setting
+    # of the grid requires, returning them by lemmatize setting
+    def preprocess(self):
+        lemmatizer = Lemmatizer.Lemmatizer(self.lemmaCache, self.workers, tokenizer=self.tokenizer)
+        preprocessed = {}
+        for lemmatize in dict.fromkeys(self.grid["lemmatize"]):
+            print("Preprocessing with lemmatize " + str(lemmatize) + "....", file=sys.stderr)
+            reader = CorpusReader.CorpusReader(self.trainingFile)
+            training = lemmatizer.lemmatize(lemmatize, reader.trainingSentences(), False)
+            tests, labels = reader.labelledTestSentences()
+            preprocessed[lemmatize] = (training, lemmatizer.lemmatize(lemmatize, tests, False), np.array(labels))
+        lemmatizer.close()
+        return preprocessed
+
+    # trains and evaluates every configuration, printing a row of the table for each as they finish in grid order
+    def run(self):
+        configurations = self.configurations()
+        preprocessed = self.preprocess()
+        print("Training " + str(len(configurations)) + " configurations in " + str(self.processes) + " processes....",
+              file=sys.stderr)
+        columns = self.SETTINGS + ["accuracy", "rounds", "seconds", "modelMB"]
+        if self.traceMemory:
+            columns.append("peakMB")
+        print("\t".join(columns))
+        initArgs = (preprocessed, self.fixedSeed, self.traceMemory)
+        with multiprocessing.Pool(self.processes, initSweep, initArgs) as pool:
+            for configuration, result in zip(configurations, pool.imap(runConfiguration, configurations)):
+                row = [configuration[name] for name in self.SETTINGS] + ["%.4f" % result["accuracy"],
+                       result["rounds"], "%.2f" % result["seconds"], "%.2f" % (result["modelBytes"] / 2 ** 20)]
+                if self.traceMemory:
+                    row.append("%.2f" % (result["peakBytes"] / 2 ** 20))
+                print("\t".join(str(value) for value in row), flush=True)
+
+    # returns the fraction of the labelled sentences whose most probable class is their label. Without seeds the
+    # classes found are in no particular order, so the order that best matches the labels is used
+    @staticmethod
+    def accuracy(probs, labels, semiSupervised):
+        predicted = np.asarray(probs).argmax(axis=1)
+        labelled = labels >= 0
+        if not labelled.any():
+            return 0.0
+        orders = [range(probs.shape[1])] if semiSupervised else itertools.permutations(range(probs.shape[1]))
+        return max(float(np.mean(np.asarray(order)[predicted[labelled]] == labels[labelled])) for order in orders)
+
+    # returns a function that parses a comma separated list of values with convert, for argparse
+    @staticmethod
+    def listOf(convert):
+        return lambda values: [convert(value) for value in values.split(",")]
+
+
+# the lemmatized sentences by lemmatize setting, whether the random initialization is seeded and whether memory is
+# traced, shared by the configurations trained in a worker process
+sweepState = None
+
+
+# sets up a worker process to train configurations. When worker processes are forked the lemmatized sentences are
+# inherited rather than copied to them
+def initSweep(preprocessed, fixedSeed, traceMemory):
+    global sweepState
+    sweepState = (preprocessed, fixedSeed, traceMemory)
+
+
+# trains a classifier of the configuration on the training sentences and classifies the test sentences with it,
+# returning its accuracy, the number of EM rounds run, the seconds taken, the bytes the model takes and, if memory is
+# traced, the peak bytes allocated while training it
+def runConfiguration(configuration):
+    preprocessed, fixedSeed, traceMemory = sweepState
+    training, tests, labels = preprocessed[configuration["lemmatize"]]
+    classifier = RottenTomatoesClassifier.RottenTomatoesClassifier()
+    classifier.lemmatize = configuration["lemmatize"]
+    classifier.semi_supervised = configuration["semiSupervised"]
+    classifier.naive_bayes = configuration["naiveBayes"]
+    classifier.vectorized = configuration["vectorized"]
+    classifier.iterations = configuration["iterations"]
+    classifier.model = classifier.createModel()
+    classifier.model.OUT_OF_VOCAB_PROB = configuration["outOfVocabProb"]
+    if traceMemory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    corpus = Corpus.Corpus.of(training, classifier.model.vocabulary)
+    prepared = classifier.model.prepare(corpus)
+    rand = random.Random(classifier.SEED) if fixedSeed else random.Random()
+    logLikelihood, rounds = classifier.expectationMaximization(corpus, prepared, rand, False)
+    probs = np.asarray(classifier.model.classifyBatch(tests))
+    result = {"accuracy": Sweep.accuracy(probs, labels, classifier.semi_supervised), "rounds": rounds,
+              "seconds": time.perf_counter() - start, "modelBytes": classifier.model.memorySize()}
+    if traceMemory:
+        result["peakBytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+# runs a sweep over the grid of the comma separated values given for each setting
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    strToBool = RottenTomatoesClassifier.RottenTomatoesClassifier.strToBool
+    parser.add_argument("-d", "--trainingFile", type=str, default="trainEMsemisup.txt")
+    parser.add_argument("-l", "--lemmatize", type=Sweep.listOf(strToBool), default=[True])
+    parser.add_argument("-s", "--semiSupervised", type=Sweep.listOf(strToBool), default=[True, False])
+    parser.add_argument("-n", "--naiveBayes", type=Sweep.listOf(strToBool), default=[True, False])
+    parser.add_argument("-v", "--vectorized", type=Sweep.listOf(strToBool), default=[False])
+    parser.add_argument("-i", "--iterations", type=Sweep.listOf(int), default=[200])
+    parser.add_argument("-o", "--outOfVocabProb", type=Sweep.listOf(float), default=[0.000001])
+    parser.add_argument("--tokenizer", choices=Lemmatizer.Lemmatizer.TOKENIZERS, default="nltk")
+    parser.add_argument("--lemmaCache", type=str, default="lemmaCache.json")
+    parser.add_argument("-w", "--workers", type=int, default=1)
+    parser.add_argument("-f", "--fixedSeed", type=strToBool, default=True)
+    parser.add_argument("-p", "--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--traceMemory", type=strToBool, default=False)
+    args = parser.parse_args()
+    if min(args.iterations) <= 0:
+        parser.error("--iterations must be positive")
+    if min(args.outOfVocabProb) <= 0 or max(args.outOfVocabProb) >= 1:
+        parser.error("--outOfVocabProb must be between 0 and 1")
+    grid = {name: getattr(args, name) for name in Sweep.SETTINGS}
+    Sweep(grid, args.trainingFile, args.tokenizer, args.lemmaCache or None, max(1, args.workers), args.fixedSeed,
+          max(1, args.processes), args.traceMemory).run()
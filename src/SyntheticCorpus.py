@@ -0,0 +1,113 @@
+import argparse
+import numpy as np
+
+
+# Generates a reproducible corpus of synthetic reviews in the format of trainEMsemisup.txt, to measure how the
+# classifier scales. Words are made up of syllables and drawn from a Zipf distribution over the vocabulary, of which
+# a share is drawn instead from a distribution particular to the class (negative or positive) of the review, so that
+# the reviews can be told apart. A fraction of the training reviews start with the seed marker of their class, and a
+# test section of labelled reviews follows them
+class SyntheticCorpus:
+    # the syllables words are made of
+    SYLLABLES = ["ka", "to", "mi", "re", "su", "na", "lo", "pe", "di", "gu", "ba", "ne", "ro", "vi", "sha", "te"]
+    # the markers of the semi-supervised reviews of each class
+    SEEDS = [":(", ":)"]
+    # the share of the words of a review that are drawn from the distribution of its class
+    SENTIMENT_WEIGHT = 0.3
+    # the shortest and longest reviews, in words
+    MIN_LENGTH = 4
+    MAX_LENGTH = 30
+    # the number of reviews drawn together
+    CHUNK = 1000
+
+    # sentences is the number of training reviews, vocabulary the number of distinct words, skew the exponent of
+    # the Zipf distribution words are drawn from, seedFraction the fraction of training reviews with a seed marker,
+    # tests the number of test reviews of each class, and seed the seed of the random numbers they are all made from
+    def __init__(self, sentences=10000, vocabulary=20000, skew=1.1, seedFraction=0.01, tests=100, seed=2019):
+        self.sentences = sentences
+        self.vocabulary = vocabulary
+        self.skew = skew
+        self.seedFraction = seedFraction
+        self.tests = tests
+        self.seed = seed
+        self.words = [self.word(i) for i in range(vocabulary)]
+        ranks = np.arange(1, vocabulary + 1, dtype=float) ** -skew
+        # the cumulative probabilities of the words shared by every class, and of those particular to each class,
+        # which ranks the words in its own order
+        self.sharedCdf = np.cumsum(ranks / ranks.sum())
+        order = np.random.default_rng(seed)
+        self.classCdfs = [np.cumsum(ranks[order.permutation(vocabulary)] / ranks.sum()) for c in self.SEEDS]
+
+    # returns the made up word of the index, its digits in base len(SYLLABLES) spelled as syllables
+    def word(self, index):
+        syllables = []
+        while True:
+            index, digit = divmod(index, len(self.SYLLABLES))
+            syllables.append(self.SYLLABLES[digit])
+            if index == 0:
+                return "".join(syllables)
+            index -= 1
+
+    # yields a (class, review) pair for each of the array of classes, drawn with the random numbers
+    def reviews(self, classes, rng):
+        for start in range(0, len(classes), self.CHUNK):
+            chunk = classes[start:start + self.CHUNK]
+            lengths = rng.integers(self.MIN_LENGTH, self.MAX_LENGTH + 1, len(chunk))
+            # the class of the review each word is in, and whether it is drawn from the distribution of that class
+            wordClasses = np.repeat(chunk, lengths)
+            sentiment = rng.random(len(wordClasses)) < self.SENTIMENT_WEIGHT
+            uniform = rng.random(len(wordClasses))
+            ids = np.searchsorted(self.sharedCdf, uniform)
+            for c, cdf in enumerate(self.classCdfs):
+                particular = sentiment & (wordClasses == c)
+                ids[particular] = np.searchsorted(cdf, uniform[particular])
+            # rounding can leave the last cumulative probability just below 1
+            ids = np.minimum(ids, self.vocabulary - 1).tolist()
+            offsets = np.concatenate([[0], np.cumsum(lengths)]).tolist()
+            for i, c in enumerate(chunk.tolist()):
+                yield c, " ".join([self.words[w] for w in ids[offsets[i]:offsets[i + 1]]])
+
+    # yields the training reviews, a seedFraction of them starting with the seed marker of their class
+    def trainingSentences(self):
+        rng = np.random.default_rng([self.seed, 0])
+        for start in range(0, self.sentences, self.CHUNK):
+            classes = rng.integers(0, len(self.SEEDS), min(self.CHUNK, self.sentences - start))
+            for c, review in self.reviews(classes, rng):
+                yield self.SEEDS[c] + " " + review if rng.random() < self.seedFraction else review
+
+    # returns the test reviews of each class, as a list of reviews per class
+    def testSentences(self):
+        rng = np.random.default_rng([self.seed, 1])
+        tests = [[] for c in self.SEEDS]
+        for c, review in self.reviews(np.repeat(np.arange(len(self.SEEDS)), self.tests), rng):
+            tests[c].append(review)
+        return tests
+
+    # yields the lines of the corpus in the format of trainEMsemisup.txt
+    def lines(self):
+        yield from self.trainingSentences()
+        yield "---"
+        for heading, reviews in zip(["Negative:", "Positive:"], self.testSentences()):
+            yield heading
+            yield from reviews
+
+    # writes the corpus to the file
+    def write(self, path):
+        with open(path, "w") as f:
+            for line in self.lines():
+                f.write(line + "\n")
+
+
+# writes a synthetic corpus to a file, which can then be given to RottenTomatoesClassifier.py with --trainingFile
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", type=str)
+    parser.add_argument("--sentences", type=int, default=10000)
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--skew", type=float, default=1.1)
+    parser.add_argument("--seedFraction", type=float, default=0.01)
+    parser.add_argument("--tests", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=2019)
+    args = parser.parse_args()
+    corpus = SyntheticCorpus(args.sentences, args.vocabulary, args.skew, args.seedFraction, args.tests, args.seed)
+    corpus.write(args.path)
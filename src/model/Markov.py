@@ -1,112 +1,125 @@
-from model import Model, WordProb
-import Sentence
+from model import Model
 
 
 # A Markov model of bigrams
 class Markov(Model.Model):
 
-    # the total number of bigrams per class is calculated as the probability of a bigram in the class
-    # times the number of bigrams in the given sentence
-    bigramCounts = [{} for i in range(2)]
-    # the total number of bigrams denoms per class is calculated as the probability of a word in the class
-    # that isn't at the end of a sentence times the number of words in the given sentence
-    bigramDenomsCounts = [{} for i in range(2)]
+    # Discards all unigram and bigram counts, leaving an untrained model
+    def reset(self):
+        super().reset()
+        # the total number of bigrams per class is calculated as the probability of a bigram in the class
+        # times the number of bigrams in the given sentence
+        self.bigramCounts = [{} for i in range(self.classes)]
+        # the total number of bigrams denoms per class is calculated as the probability of a word in the class
+        # that isn't at the end of a sentence times the number of words in the given sentence
+        self.bigramDenomsCounts = [{} for i in range(self.classes)]
+        # the first bigram counted in each bucket, when bigrams are hashed into buckets
+        self.bigramNames = {}
 
     # Update the model given a sentence and its probability of
     # belonging to each class
     def update(self, sentence, probs):
-        words = sentence.lemmas.split(" ")
+        self.updateWords(sentence.lemmas.split(" "), probs)
+
+    # Updates the model given the words of a sentence and its probability of belonging to each class
+    def updateWords(self, words, probs):
+        # the keys the words, and the bigrams ending at every word after the first, are counted under
+        keys = self.keys(words, self.wordNames)
+        bigrams = self.keys(self.bigramsOf(words), self.bigramNames)
 
         # updates class count and total words
         for i, p in enumerate(probs):
             self.classCounts[i] += p
             self.totalWords[i] += p * len(words)
 
-            previousWord = None
-            for j, word in enumerate(words):
+            for j, word in enumerate(keys):
                 # updates wordCounts for this class and word
                 if word in self.wordCounts[i]:
                     self.wordCounts[i][word] = self.wordCounts[i].get(word) + p
-                else:
+                elif self.growing:
                     self.wordCounts[i][word] = p
 
                 # updates bigramCounts for this class and bigram
-                if previousWord is not None:
-                    bigram = previousWord + " " + word
+                if j > 0:
+                    bigram = bigrams[j - 1]
                     if bigram in self.bigramCounts[i]:
                         self.bigramCounts[i][bigram] = self.bigramCounts[i].get(bigram) + p
-                    else:
+                    elif self.growing:
                         self.bigramCounts[i][bigram] = p
 
                 # updates bigramDenomsCounts for this class and bigramDenom
                 if j != len(words) - 1:
                     if word in self.bigramDenomsCounts[i]:
                         self.bigramDenomsCounts[i][word] = self.bigramDenomsCounts[i].get(word) + p
-                    else:
+                    elif self.growing:
                         self.bigramDenomsCounts[i][word] = p
-                previousWord = word
 
-    # Classify a new sentence using the data and a Markov model.
+    # Multiplies every unigram and bigram count of the model by the factor
+    def scale(self, factor):
+        super().scale(factor)
+        self.scaleTables(self.bigramCounts, factor)
+        self.scaleTables(self.bigramDenomsCounts, factor)
+
+    # Removes the unigrams and bigrams whose count summed over every class is below minCount, returning how many were
+    # removed
+    def prune(self, minCount):
+        removed = super().prune(minCount)
+        removed += self.pruneTables(self.bigramCounts, minCount)
+        # a word counted less than minCount times before the end of a sentence only starts bigrams that are pruned
+        return removed + self.pruneTables(self.bigramDenomsCounts, minCount)
+
+    # Returns the approximate number of bytes taken by the unigram and bigram count tables of the model
+    def memorySize(self):
+        return super().memorySize() + self.tablesSize(self.bigramCounts + self.bigramDenomsCounts + [self.bigramNames])
+
+    # Score a new sentence using the data and a Markov model.
     # Assume every token in the sentence is space-delimited, as the input
-    # was.  Return a list of class probabilities.
-    def classify(self, sentence):
-        probs = []
+    # was.  Return a list of log(P(class) * P(sentence | class)) per class.
+    def logJoint(self, sentence):
+        return self.logJointWords(sentence.lemmas.split(" "))
 
-        # iterates through all classes and calculates a probability proportional to the probability
+    # Returns log(P(class) * P(sentence | class)) for each class given the words of a sentence
+    def logJointWords(self, words):
+        logProbs = []
+        keys = self.keys(words)
+        bigrams = self.keys(self.bigramsOf(words))
+        # The probability of each class P(class)
+        # which is defined by (# of sentences with class / # of sentences)
+        logClassProbs = self.logClassProbs()
+
+        # iterates through all classes and calculates the log of a probability proportional to the probability
         # that the sentence belongs to each class
-        for i, c in enumerate(self.classCounts):
-            # Calculates The probability of the class P(class)
-            # which is defined by (# of sentences with class / # of sentences)
-            pClass = self.classProbability(i)
-            # calculates P(word | class) for all words in the sentence
-            pWords = 1
-            # the previous word
-            previousWord = None
-            for j, word in enumerate(sentence.lemmas.split(" ")):
+        for i, logClassProb in enumerate(logClassProbs):
+            logProb = logClassProb
+            for j, word in enumerate(keys):
                 if j == 0:
-                    if word in self.wordCounts[i]:
-                        # Adds P(word | class) = wordCount / # of class words
-                        pWords *= self.wordCounts[i].get(word) / self.totalWords[i]
-                    else:
-                        pWords *= self.OUT_OF_VOCAB_PROB
+                    # Adds log P(word | class) = log(wordCount / # of class words)
+                    logProb += self.logRatio(self.wordCounts[i].get(word, 0), self.totalWords[i])
                 else:
-                    bigram = previousWord + " " + word
-                    # if not the first word in the sentence, P(word i | word at i-1) must be multiplied as
+                    # if not the first word in the sentence, log P(word i | word at i-1) must be added as
                     # well, which is calculated as (# of times bigram appears in the class / # of times
                     # first word of bigram appears in class)
-                    if bigram in self.bigramCounts[i]\
-                            and previousWord in self.bigramDenomsCounts[i]\
-                            and self.bigramDenomsCounts[i].get(previousWord) != 0:
-                        pWords *= self.bigramCounts[i].get(bigram) / self.bigramDenomsCounts[i].get(previousWord)
-                    else:
-                        pWords = self.OUT_OF_VOCAB_PROB
-                previousWord = word
-
-            prob = pClass * pWords
-            if prob <= 1.1754943508222875e-100:
-                probs.append(1.1754943508222875e-38)
-            else:
-                probs.append(prob)
-        return self.normalize(probs)
-
-    # printTopWords: Print n bigrams with the highest
-    # Pr(thisClass | bigram) = scale Pr(bigram | thisClass)Pr(thisClass)
-    # but skip those that have appeared (in expectation) less than
-    # MIN_TO_PRINT times for this class (to avoid random weird bigrams
-    # that only show up once in any sentence)
-    def printTopWords(self, n):
-        for i, c in enumerate(self.bigramCounts):
-            print("Cluster " + str(i) + ":")
-            wordProbs = []
-            for bigram in c.keys():
-                if self.bigramCounts[i].get(bigram) >= self.MIN_TO_PRINT:
-                    probs = self.classify(Sentence.Sentence(bigram, bigram))
-                    wordProbs.append(WordProb.WordProb(bigram, probs[i]))
-            wordProbs.sort(key=lambda x: x.prob, reverse=True)
-            j = 0
-            while j < n:
-                if j >= len(wordProbs):
-                    print("No more words...")
-                    break
-                print(wordProbs[j].word)
-                j += 1
+                    logProb += self.logRatio(self.bigramCounts[i].get(bigrams[j - 1], 0),
+                                             self.bigramDenomsCounts[i].get(keys[j - 1], 0))
+            logProbs.append(logProb)
+        return logProbs
+
+    # Returns the n bigrams with the highest Pr(thisClass | bigram) for each class, as a list per class of
+    # WordProbs from the most probable down, skipping those that have appeared (in expectation) less than
+    # MIN_TO_PRINT times for the class. Each bigram is scored as a sentence of its own,
+    # log P(class) + log P(first word | class) + log P(second word | first word, class)
+    def topWords(self, n):
+        logClassProbs = self.logClassProbs()
+
+        def logJointBigram(bigram):
+            # a hashed bigram is scored with the first word of the first bigram counted in its bucket
+            first = self.keys([self.bigramNames.get(bigram, bigram).split(" ")[0]])[0]
+            return [logClassProbs[i] + self.logRatio(self.wordCounts[i].get(first, 0), self.totalWords[i])
+                    + self.logRatio(self.bigramCounts[i].get(bigram, 0), self.bigramDenomsCounts[i].get(first, 0))
+                    for i in range(len(logClassProbs))]
+        return self.rankTerms(self.bigramCounts, logJointBigram, n, self.bigramNames)
+
+    # returns the bigram ending at every word of the words after the first, as the two words separated by a space
+    @staticmethod
+    def bigramsOf(words):
+        return [words[j - 1] + " " + words[j] for j in range(1, len(words))]
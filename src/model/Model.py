@@ -1,4 +1,9 @@
+import heapq
+import math
+import sys
+import zlib
 from abc import ABC, abstractmethod
+from model import Vocabulary, WordProb
 
 
 # Either a NaiveBayesModel or a MarkovModel
@@ -6,17 +11,35 @@ class Model(ABC):
     # Times (in expectation) that we need to see a word in a cluster
     # before we think it's meaningful enough to print in the summary
     MIN_TO_PRINT = 15.0
-    # Probability of either a unigram or bigram that hasn't been seen
-    # have make this generous since we're not using logs
+    # Probability of either a unigram or bigram that hasn't been seen (in expectation) in a class, which is also
+    # the least probability any unigram or bigram is given
     OUT_OF_VOCAB_PROB = 0.000001
+    # The number of buckets unigrams and bigrams are hashed into so that the count tables stay within a fixed size,
+    # or 0 to count every unigram and bigram by itself
+    buckets = 0
 
-    # the probability counts for each class
-    classCounts = [0.0]*2
-    # the total number of words per class is calculated as the probability of a word in the class
-    # times the number of words in the given sentence
-    totalWords = [0.0]*2
-    # the probability of a given word in each class
-    wordCounts = [{} for i in range(2)]
+    # classes is the number of classes the sentences are clustered into, which every count table is sized for
+    def __init__(self, classes=2):
+        self.classes = classes
+        # the words known to the model, shared with every corpus it is trained on
+        self.vocabulary = Vocabulary.Vocabulary()
+        self.reset()
+
+    # Discards all counts, leaving an untrained model. The count tables are created per instance so that a
+    # reset model never shares state with a previously trained one
+    def reset(self):
+        # the probability counts for each class
+        self.classCounts = [0.0]*self.classes
+        # the total number of words per class is calculated as the probability of a word in the class
+        # times the number of words in the given sentence
+        self.totalWords = [0.0]*self.classes
+        # the probability of a given word in each class
+        self.wordCounts = [{} for i in range(self.classes)]
+        # the first word counted in each bucket, when words are hashed into buckets
+        self.wordNames = {}
+        # whether updates add unigrams and bigrams that aren't in the count tables yet, which stops once the model
+        # has been pruned so that the pruned ones stay out of it
+        self.growing = True
 
     @abstractmethod
     # Updates the model given a sentence and its probability of belonging to each class
@@ -24,32 +47,171 @@ class Model(ABC):
         return
 
     @abstractmethod
-    # Classifies a new sentence using the data in the model
-    def classify(self, sentence):
+    # Returns log(P(class) * P(sentence | class)) for each class, using the data in the model
+    def logJoint(self, sentence):
         return
 
     @abstractmethod
+    # Returns the n words/bigrams with the highest Pr(thisClass | word/bigram) for each class, as a list per class
+    # of WordProbs from the most probable down, skipping those that have appeared (in expectation) less than
+    # MIN_TO_PRINT times for the class
+    def topWords(self, n):
+        return
+
     # printTopWords: Print n words/bigrams with the highest
     # Pr(thisClass | word/bigram) = scale Pr(word/bigram | thisClass)Pr(thisClass)
     # but skip those that have appeared (in expectation) less than
     # MIN_TO_PRINT times for this class (to avoid random weird words/bigrams
     # that only show up once in any sentence)
     def printTopWords(self, n):
-        return
+        for i, wordProbs in enumerate(self.topWords(n)):
+            print("Cluster " + str(i) + ":")
+            for wordProb in wordProbs:
+                print(wordProb.word)
+            if len(wordProbs) < n:
+                print("No more words...")
+
+    # Converts a Corpus interned against the vocabulary into the representation used by classifyAll and updateAll,
+    # which for the dict based models is a tuple of the words of each sentence, split once for every EM round and
+    # scored and counted by logJointWords and updateWords
+    def prepare(self, corpus):
+        return [corpus.words(i) for i in range(len(corpus))]
+
+    # Returns the part of a prepared corpus made of the sentences at the given indices
+    def select(self, corpus, indices):
+        return [corpus[i] for i in indices]
+
+    # Classifies a new sentence using the data in the model, returning a list of class probabilities
+    def classify(self, sentence):
+        logProbs = self.logJoint(sentence)
+        total = self.logSumExp(logProbs)
+        return [math.exp(p - total) for p in logProbs]
+
+    # Classifies new sentences in a single batch, returning the class probabilities of each sentence
+    def classifyBatch(self, sentences):
+        return [self.classify(sentence) for sentence in sentences]
+
+    # Classifies every sentence of a prepared corpus, returning the class probabilities of each sentence
+    def classifyAll(self, corpus):
+        return self.scoreAll(corpus)[0]
+
+    # Classifies every sentence of a prepared corpus, returning the class probabilities of each sentence along with
+    # the log-likelihood of the whole corpus, the sum of log P(sentence) over every sentence
+    def scoreAll(self, corpus):
+        probs = []
+        logLikelihood = 0.0
+        for words in corpus:
+            logProbs = self.logJointWords(words)
+            total = self.logSumExp(logProbs)
+            probs.append([math.exp(p - total) for p in logProbs])
+            logLikelihood += total
+        return probs, logLikelihood
+
+    # Updates the model given every sentence of a prepared corpus and its probabilities of belonging to each class.
+    # As the counts are linear in the probabilities, passing the change in each sentence's probabilities since it
+    # was last added moves the model to the one it would be if it were rebuilt from the new probabilities
+    def updateAll(self, corpus, probs):
+        for words, p in zip(corpus, probs):
+            self.updateWords(words, p)
+
+    # Returns the n terms with the highest Pr(class | term) for each class as lists of WordProbs, given the
+    # (class -> term -> count) tables and a function returning the log(P(class) * P(term | class)) of every class for
+    # a term. The terms that have appeared at least MIN_TO_PRINT times in any class are each scored once, and only the
+    # n best of each class are kept rather than sorting them all. Ties keep the order of the count tables. Hashed
+    # terms are named by the first term counted in their bucket in names
+    def rankTerms(self, counts, logJointTerm, n, names):
+        candidates = [[term for term, count in c.items() if count >= self.MIN_TO_PRINT] for c in counts]
+        probs = {}
+        for terms in candidates:
+            for term in terms:
+                if term not in probs:
+                    logProbs = logJointTerm(term)
+                    total = self.logSumExp(logProbs)
+                    probs[term] = [math.exp(p - total) for p in logProbs]
+        return [[WordProb.WordProb(names.get(term, term), probs[term][i])
+                 for term in heapq.nlargest(n, terms, key=lambda term: probs[term][i])]
+                for i, terms in enumerate(candidates)]
 
-    # returns the probability of this class
-    def classProbability(self, classIndex):
+    # Multiplies every count of the model by the factor, which leaves its probabilities unchanged but weighs it
+    # against the counts of later updates
+    def scale(self, factor):
+        self.classCounts = [count * factor for count in self.classCounts]
+        self.totalWords = [count * factor for count in self.totalWords]
+        self.scaleTables(self.wordCounts, factor)
+
+    # multiplies every count of the (class -> term -> count) tables by the factor
+    @staticmethod
+    def scaleTables(tables, factor):
+        for table in tables:
+            for term in table:
+                table[term] *= factor
+
+    # Returns the keys the terms are counted under, which are the terms themselves unless they are hashed into
+    # buckets. A stable hash is used so that every process counts a term in the same bucket. The first term counted
+    # in each bucket is kept in names, if given, to stand for the bucket in the top words
+    def keys(self, terms, names=None):
+        if not self.buckets:
+            return terms
+        keys = [zlib.crc32(term.encode("utf-8")) % self.buckets for term in terms]
+        if names is not None:
+            for key, term in zip(keys, terms):
+                if key not in names:
+                    names[key] = term
+        return keys
+
+    # Removes the words whose count summed over every class is below minCount, returning how many were removed.
+    # Removed words score like words that have never been seen, and later updates no longer add new words
+    def prune(self, minCount):
+        self.growing = False
+        return self.pruneTables(self.wordCounts, minCount)
+
+    # removes the terms whose count summed over every (term -> count) table of the list is below minCount from all of
+    # them, returning how many were removed. The tables are replaced by new ones, as dicts don't shrink as they empty
+    @staticmethod
+    def pruneTables(tables, minCount):
+        totals = {}
+        for table in tables:
+            for term, count in table.items():
+                totals[term] = totals.get(term, 0.0) + count
+        for i, table in enumerate(tables):
+            tables[i] = {term: count for term, count in table.items() if totals[term] >= minCount}
+        return sum(1 for total in totals.values() if total < minCount)
+
+    # Returns the approximate number of bytes taken by the count tables of the model
+    def memorySize(self):
+        return self.tablesSize(self.wordCounts + [self.wordNames])
+
+    # returns the approximate number of bytes taken by the dicts along with their keys and values
+    @staticmethod
+    def tablesSize(tables):
+        return sum(sys.getsizeof(table) + sum(sys.getsizeof(key) + sys.getsizeof(value) for key, value in table.items())
+                   for table in tables)
+
+    # returns log P(class) for every class, summing the class counts once rather than once per class
+    def logClassProbs(self):
         total = 0
         for value in self.classCounts:
             total += value
-        return self.classCounts[classIndex] / total
+        return [self.log(count / total) for count in self.classCounts]
+
+    # returns the log of a probability, which is -inf for a probability of 0
+    @staticmethod
+    def log(p):
+        return math.log(p) if p > 0 else -math.inf
+
+    # returns log(count / total) floored at log OUT_OF_VOCAB_PROB, so that a unigram or bigram seen only a tiny
+    # fraction of a time in a class (such as rounding left over by incremental updates) scores like an unseen one
+    # instead of far worse
+    def logRatio(self, count, total):
+        if total <= 0:
+            return math.log(self.OUT_OF_VOCAB_PROB)
+        return math.log(max(count / total, self.OUT_OF_VOCAB_PROB))
 
-    # adjusts the current proportional probabilities to sum to 1
+    # returns log(sum(exp(logProbs))) without underflowing, the log of the normalizing constant that makes the
+    # proportional probabilities sum to 1
     @staticmethod
-    def normalize(probs):
-        pSum = 0
-        for p in probs:
-            pSum += p
-        for i, p in enumerate(probs):
-            probs[i] = probs[i] / pSum
-        return probs
+    def logSumExp(logProbs):
+        largest = max(logProbs)
+        if largest == -math.inf:
+            return largest
+        return largest + math.log(sum(math.exp(p - largest) for p in logProbs))
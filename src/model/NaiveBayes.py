@@ -1,5 +1,4 @@
-from model import Model, WordProb
-import Sentence
+from model import Model
 
 
 # A Naive Bayes model
@@ -8,7 +7,11 @@ class NaiveBayes(Model.Model):
     # Update the model given a sentence and its probability of
     # belonging to each class
     def update(self, sentence, probs):
-        words = sentence.lemmas.split(" ")
+        self.updateWords(sentence.lemmas.split(" "), probs)
+
+    # Updates the model given the words of a sentence and its probability of belonging to each class
+    def updateWords(self, words, probs):
+        words = self.keys(words, self.wordNames)
 
         # updates class count and total words
         for i, p in enumerate(probs):
@@ -18,55 +21,39 @@ class NaiveBayes(Model.Model):
             for word in words:
                 if word in self.wordCounts[i]:
                     self.wordCounts[i][word] = self.wordCounts[i].get(word) + p
-                else:
+                elif self.growing:
                     self.wordCounts[i][word] = p
 
-    # Classifies a new sentence using the data and a Naive Bayes model.
+    # Scores a new sentence using the data and a Naive Bayes model.
     # Assume every token in the sentence is space-delimited, as the input
-    # was. Return a list of class probabilities.
-    def classify(self, sentence):
-        probs = []
-
-        # iterates through all classes and calculates a probability proportional to the probability
+    # was. Return a list of log(P(class) * P(sentence | class)) per class.
+    def logJoint(self, sentence):
+        return self.logJointWords(sentence.lemmas.split(" "))
+
+    # Returns log(P(class) * P(sentence | class)) for each class given the words of a sentence
+    def logJointWords(self, words):
+        logProbs = []
+        words = self.keys(words)
+        # The probability of each class P(class)
+        # which is defined by (# of sentences with class / # of sentences)
+        logClassProbs = self.logClassProbs()
+
+        # iterates through all classes and calculates the log of a probability proportional to the probability
         # that the sentence belongs to each class
-        for i, c in enumerate(self.classCounts):
-            # Calculates The probability of the class P(class)
-            # which is defined by (# of sentences with class / # of sentences)
-            pClass = self.classProbability(i)
-            # calculates P(word | class) for all words in the sentence
-            pWords = 1
-            for word in sentence.lemmas.split(" "):
-                if word in self.wordCounts[i]:
-                    # Adds P(word | class) = wordCount / # of class words
-                    pWords *= self.wordCounts[i].get(word) / self.totalWords[i]
-                else:
-                    pWords *= self.OUT_OF_VOCAB_PROB
-
-            prob = pClass * pWords
-            if prob <= 1.1754943508222875e-100:
-                probs.append(1.1754943508222875e-38)
-            else:
-                probs.append(prob)
-        return self.normalize(probs)
-
-    # printTopWords: Print n words with the highest
-    # Pr(thisClass | word) = scale Pr(word | thisClass)Pr(thisClass)
-    # but skip those that have appeared (in expectation) less than
-    # MIN_TO_PRINT times for this class (to avoid random weird words
-    # that only show up once in any sentence)
-    def printTopWords(self, n):
-        for i, c in enumerate(self.wordCounts):
-            print("Cluster " + str(i) + ":")
-            wordProbs = []
-            for word in c.keys():
-                if self.wordCounts[i].get(word) >= self.MIN_TO_PRINT:
-                    probs = self.classify(Sentence.Sentence(word, word))
-                    wordProbs.append(WordProb.WordProb(word, probs[i]))
-            wordProbs.sort(key=lambda x: x.prob, reverse=True)
-            j = 0
-            while j < n:
-                if j >= len(wordProbs):
-                    print("No more words...")
-                    break
-                print(wordProbs[j].word)
-                j += 1
+        for i, logClassProb in enumerate(logClassProbs):
+            logProb = logClassProb
+            # adds log P(word | class) for all words in the sentence
+            for word in words:
+                # P(word | class) = wordCount / # of class words
+                logProb += self.logRatio(self.wordCounts[i].get(word, 0), self.totalWords[i])
+            logProbs.append(logProb)
+        return logProbs
+
+    # Returns the n words with the highest Pr(thisClass | word) for each class, as a list per class of WordProbs
+    # from the most probable down, skipping those that have appeared (in expectation) less than MIN_TO_PRINT times
+    # for the class. Each word is scored as a sentence of its own, log P(class) + log P(word | class)
+    def topWords(self, n):
+        logClassProbs = self.logClassProbs()
+        return self.rankTerms(self.wordCounts, lambda word: [
+            logClassProbs[i] + self.logRatio(self.wordCounts[i].get(word, 0), self.totalWords[i])
+            for i in range(len(logClassProbs))], n, self.wordNames)
@@ -0,0 +1,209 @@
+import numpy as np
+from model import SparseModel, Vocabulary
+
+
+# A vectorized Markov model of bigrams. Each bigram is interned once as an integer id for its (previous word, word)
+# pair, and bigram and denominator counts are kept in (id x class) arrays. Prepared corpora are the first word of
+# each sentence along with sparse sentence-by-bigram and sentence-by-word count matrices, so that a whole expectation
+# or maximization step is a handful of matrix products. Gives the same probabilities as Markov
+class SparseMarkov(SparseModel.SparseModel):
+
+    def __init__(self, classes=2):
+        # the (previous word id, word id) pairs seen by the model, interned as bigram ids. A loaded model only builds
+        # it once a corpus grows the model, as it looks bigrams up in bigramKeys instead, and it is None until then
+        self.bigrams = Vocabulary.Vocabulary()
+        # the (previous word id, word id) pair of each bigram, as a (bigram x 2) array
+        self.bigramPairs = np.zeros((0, 2), dtype=np.int64)
+        # the id of the previous word of each bigram
+        self.bigramFirsts = self.bigramPairs[:, 0]
+        # the key of every bigram in sorted order, along with the id of the bigram of each, or None until bigrams are
+        # first looked up without growing the model
+        self.bigramKeys = None
+        self.bigramOrder = None
+        super().__init__(classes)
+
+    # Discards all unigram and bigram counts, leaving an untrained model
+    def reset(self):
+        super().reset()
+        # the probability of a given bigram in each class, as a (bigram x class) array
+        self.bigramCounts = np.zeros((len(self.bigramPairs), self.classes))
+        # the probability of a given word that isn't at the end of a sentence in each class,
+        # as a (vocabulary x class) array
+        self.bigramDenomsCounts = np.zeros((len(self.vocabulary), self.classes))
+
+    # Converts the corpus into the id of the first word of each sentence (-1 if it's not in the vocabulary), their
+    # (sentence x vocabulary) word counts, their (sentence x vocabulary) counts of words that aren't at the end of
+    # the sentence, their (sentence x bigram) bigram counts, and the number of bigrams in each sentence that are not
+    # known to the model. New bigrams are added to the model when the corpus grows the vocabulary
+    def prepare(self, corpus):
+        ids, offsets, rows = self.flatten(corpus)
+        size = len(corpus)
+        known = ids >= 0
+        words = self.countMatrix(rows[known], ids[known], size, len(self.vocabulary))
+        # every word followed by another word of the same sentence starts a bigram
+        starts = np.flatnonzero(rows[:-1] == rows[1:])
+        denoms = self.countMatrix(rows[starts][known[starts]], ids[starts][known[starts]], size, len(self.vocabulary))
+        if corpus.grow:
+            bigramIds = self.internBigrams(ids[starts], ids[starts + 1])
+        else:
+            bigramIds = self.findBigrams(ids[starts], ids[starts + 1])
+        knownBigrams = bigramIds >= 0
+        bigrams = self.countMatrix(rows[starts][knownBigrams], bigramIds[knownBigrams], size, len(self.bigramPairs))
+        outOfVocab = np.bincount(rows[starts][~knownBigrams], minlength=size).astype(float)
+        return ids[offsets[:-1]], words, denoms, bigrams, outOfVocab
+
+    # Returns the part of a prepared corpus made of the sentences at the given indices
+    def select(self, corpus, indices):
+        return tuple(part[indices] for part in corpus)
+
+    # Returns a (sentence x class) array of log(P(class) * P(sentence | class)) for every sentence of a prepared corpus
+    def logJointAll(self, corpus):
+        firsts, words, denoms, bigrams, outOfVocab = corpus
+        # P(first word | class) = wordCount / # of class words
+        logWordProbs = self.logWordProbs()
+        logFirsts = np.full((len(firsts), self.classes), np.log(self.OUT_OF_VOCAB_PROB))
+        knownFirsts = firsts >= 0
+        logFirsts[knownFirsts] = logWordProbs[firsts[knownFirsts]]
+        # every later word multiplies in P(word i | word at i-1), the # of times the bigram appears in the class
+        # over the # of times the first word of the bigram appears in the class (before the end of a sentence)
+        logBigramProbs = self.logBigramProbs()[:bigrams.shape[1]]
+        logProbs = self.logClassProbs() + logFirsts + bigrams @ logBigramProbs
+        return logProbs + outOfVocab[:, None] * np.log(self.OUT_OF_VOCAB_PROB)
+
+    # Returns what updating the model with every sentence of a prepared corpus and its probabilities of belonging to
+    # each class adds to each unigram and bigram count table, as the rows added to along with their values
+    def statistics(self, corpus, probs, terms=None):
+        firsts, words, denoms, bigrams, outOfVocab = corpus
+        firstTerms, wordTerms, denomTerms, bigramTerms, outOfVocabTerms = terms or (None,) * len(corpus)
+        return {"classCounts": (None, probs.sum(axis=0)),
+                "totalWords": (None, np.asarray(words.sum(axis=1)).ravel() @ probs),
+                "wordCounts": self.termStatistics(words, probs, wordTerms),
+                "bigramDenomsCounts": self.termStatistics(denoms, probs, denomTerms),
+                "bigramCounts": self.termStatistics(bigrams, probs, bigramTerms)}
+
+    # Returns the n bigrams with the highest Pr(thisClass | bigram) for each class, as a list per class of
+    # WordProbs from the most probable down, skipping those that have appeared (in expectation) less than
+    # MIN_TO_PRINT times for the class
+    def topWords(self, n):
+        # every bigram classified as a sentence of its own, in a single batch
+        logProbs = self.logClassProbs() + self.logWordProbs()[self.bigramFirsts] + self.logBigramProbs()
+        probs = self.normalizeLogs(logProbs)[0]
+        return self.rankTermArrays(probs, self.bigramCounts >= self.MIN_TO_PRINT, self.bigramName, n)
+
+    # returns the two words of the bigram id separated by a space
+    def bigramName(self, bigram):
+        first, second = self.bigramPairs[bigram].tolist()
+        return self.vocabulary.words[first] + " " + self.vocabulary.words[second]
+
+    # Multiplies every unigram and bigram count of the model by the factor
+    def scale(self, factor):
+        super().scale(factor)
+        self.bigramCounts = self.bigramCounts * factor
+        self.bigramDenomsCounts = self.bigramDenomsCounts * factor
+
+    # Returns the approximate number of bytes taken by the unigram and bigram count tables and vocabularies of the model
+    def memorySize(self):
+        arrays = [self.bigramCounts, self.bigramDenomsCounts, self.bigramPairs]
+        if self.bigramKeys is not None:
+            arrays += [self.bigramKeys, self.bigramOrder]
+        size = super().memorySize() + sum(array.nbytes for array in arrays)
+        return size + (self.tablesSize([self.bigrams.ids]) if self.bigrams is not None else 0)
+
+    # returns log(bigramCount / bigramDenomsCount) for every bigram, with bigrams that haven't been seen in the
+    # class given OUT_OF_VOCAB_PROB
+    def logBigramProbs(self):
+        return self.logTable("bigrams",
+                             lambda: self.logRatio(self.bigramCounts, self.bigramDenomsCounts[self.bigramFirsts]))
+
+    # returns the unigram and bigram count tables of the model by name
+    def countArrays(self):
+        arrays = super().countArrays()
+        arrays["bigramCounts"] = self.bigramCounts
+        arrays["bigramDenomsCounts"] = self.bigramDenomsCounts
+        return arrays
+
+    # replaces the unigram and bigram count tables of the model with ones returned by countArrays
+    def setCountArrays(self, arrays):
+        super().setCountArrays(arrays)
+        self.bigramCounts = arrays["bigramCounts"]
+        self.bigramDenomsCounts = arrays["bigramDenomsCounts"]
+
+    # returns the unigram and bigram count tables of the model by name, along with the previous word of every bigram
+    def scoringArrays(self):
+        arrays = super().scoringArrays()
+        arrays["bigramFirsts"] = self.bigramFirsts
+        return arrays
+
+    # replaces the unigram and bigram count tables and the previous word of every bigram with ones returned by
+    # scoringArrays. The bigrams themselves are left out, so the model can score prepared corpora but not prepare them
+    def setScoringArrays(self, arrays):
+        super().setScoringArrays(arrays)
+        self.bigramFirsts = arrays["bigramFirsts"]
+
+    # returns the unigram and bigram count tables of the model by name, along with the word ids of every bigram and
+    # the sorted keys they are looked up by
+    def getArrays(self):
+        arrays = super().getArrays()
+        arrays["bigrams"] = self.bigramPairs
+        arrays["bigramKeys"], arrays["bigramOrder"] = self.sortedBigramKeys()
+        return arrays
+
+    # replaces the unigram and bigram count tables and the bigrams of the model with ones returned by getArrays. The
+    # bigrams are kept as the arrays they are given, so that a memory-mapped model is loaded without reading them
+    def setArrays(self, arrays):
+        super().setArrays(arrays)
+        self.bigramPairs = arrays["bigrams"]
+        self.bigramFirsts = self.bigramPairs[:, 0]
+        # models saved before the keys were kept sort them once they are first needed
+        self.bigramKeys = arrays.get("bigramKeys")
+        self.bigramOrder = arrays.get("bigramOrder")
+        self.bigrams = None
+        self.logTables = {}
+
+    # returns the ids of the bigrams of each pair of word ids, interning those that are new. Bigrams containing
+    # unknown words are -1
+    def internBigrams(self, firsts, seconds):
+        if self.bigrams is None:
+            self.bigrams = Vocabulary.Vocabulary.of(map(tuple, self.bigramPairs.tolist()))
+        bigramIds = np.array([-1 if first < 0 or second < 0 else self.bigrams.index((first, second))
+                              for first, second in zip(firsts.tolist(), seconds.tolist())], dtype=np.int64)
+        if len(self.bigrams) > len(self.bigramPairs):
+            added = np.array(self.bigrams.words[len(self.bigramPairs):], dtype=np.int64)
+            self.bigramPairs = np.concatenate([self.bigramPairs, added])
+            self.bigramFirsts = self.bigramPairs[:, 0]
+            self.bigramKeys = None
+            self.bigramOrder = None
+        return bigramIds
+
+    # returns the ids of the bigrams of each pair of word ids by binary search of the sorted bigram keys, without
+    # interning them. Bigrams containing unknown words or that are unknown to the model are -1
+    def findBigrams(self, firsts, seconds):
+        keys, order = self.sortedBigramKeys()
+        if len(keys) == 0:
+            return np.full(len(firsts), -1, dtype=np.int64)
+        wanted = self.bigramKey(firsts, seconds)
+        positions = np.minimum(np.searchsorted(keys, wanted), len(keys) - 1)
+        found = (firsts >= 0) & (seconds >= 0) & (keys[positions] == wanted)
+        return np.where(found, order[positions], -1)
+
+    # returns the key of every bigram in sorted order, along with the id of the bigram of each, sorting them if they
+    # haven't been since bigrams were last added
+    def sortedBigramKeys(self):
+        if self.bigramKeys is None:
+            keys = self.bigramKey(self.bigramPairs[:, 0], self.bigramPairs[:, 1])
+            self.bigramOrder = np.argsort(keys, kind="stable")
+            self.bigramKeys = keys[self.bigramOrder]
+        return self.bigramKeys, self.bigramOrder
+
+    # returns the keys of the bigrams of each pair of word ids, which are unique for pairs of known words
+    @staticmethod
+    def bigramKey(firsts, seconds):
+        return (np.asarray(firsts, dtype=np.int64) << 32) | np.asarray(seconds, dtype=np.int64)
+
+    # pads the unigram and bigram count tables with zeros for words and bigrams added since they were created
+    def growTables(self):
+        super().growTables()
+        self.bigramDenomsCounts = self.padRows(self.bigramDenomsCounts, len(self.vocabulary))
+        if len(self.bigramCounts) < len(self.bigramPairs):
+            self.bigramCounts = self.padRows(self.bigramCounts, len(self.bigramPairs))
+            self.logTables = {}
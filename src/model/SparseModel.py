@@ -0,0 +1,204 @@
+from abc import abstractmethod
+import numpy as np
+from scipy import sparse, special
+from model import Model, WordProb
+import Corpus
+
+
+# A model whose counts are kept in arrays indexed by vocabulary id rather than dicts keyed by word, so that a whole
+# prepared corpus can be classified or used to update the model with a few batched array operations
+class SparseModel(Model.Model):
+
+    # Discards all counts, leaving an untrained model. The vocabulary is kept so prepared corpora stay valid
+    def reset(self):
+        # the probability counts for each class
+        self.classCounts = np.zeros(self.classes)
+        # the total number of words per class is calculated as the probability of a word in the class
+        # times the number of words in the given sentence
+        self.totalWords = np.zeros(self.classes)
+        # the probability of a given word in each class, as a (vocabulary x class) array
+        self.wordCounts = np.zeros((len(self.vocabulary), self.classes))
+        # the log probability tables derived from the counts, by name, until the counts next change
+        self.logTables = {}
+
+    # Update the model given a sentence and its probability of
+    # belonging to each class
+    def update(self, sentence, probs):
+        self.updateAll(self.prepare(Corpus.Corpus.of([sentence], self.vocabulary, seeded=False)), [probs])
+
+    # Returns log(P(class) * P(sentence | class)) for each class, using the data in the model
+    def logJoint(self, sentence):
+        corpus = Corpus.Corpus.of([sentence], self.vocabulary, grow=False, seeded=False)
+        return self.logJointAll(self.prepare(corpus))[0].tolist()
+
+    @abstractmethod
+    # Returns a (sentence x class) array of log(P(class) * P(sentence | class)) for every sentence of a prepared corpus
+    def logJointAll(self, corpus):
+        return
+
+    # Classifies new sentences in a single batch, returning a (sentence x class) array of class probabilities
+    def classifyBatch(self, sentences):
+        corpus = Corpus.Corpus.of(sentences, self.vocabulary, grow=False, seeded=False)
+        return self.classifyAll(self.prepare(corpus))
+
+    # Classifies every sentence of a prepared corpus, returning a (sentence x class) array of class probabilities
+    # along with the log-likelihood of the whole corpus
+    def scoreAll(self, corpus):
+        probs, logLikelihoods = self.normalizeLogs(self.logJointAll(corpus))
+        return probs, float(logLikelihoods.sum())
+
+    # Updates the model given every sentence of a prepared corpus and its probabilities of belonging to each class.
+    # The probabilities are reshaped so that those of an empty corpus are still a (sentence x class) array
+    def updateAll(self, corpus, probs):
+        self.addStatistics(self.statistics(corpus, np.asarray(probs, dtype=float).reshape(-1, self.classes)))
+
+    @abstractmethod
+    # Returns what updating the model with every sentence of a prepared corpus and its probabilities of belonging to
+    # each class adds to each count table, by name, as the rows of the table added to (or None for the whole of a one
+    # dimensional table) along with the values added to them, so that they can be computed apart from the model and
+    # added to it later. The columns of each sparse part of the corpus are the terms known to the model, or if terms
+    # is given the terms it has for that part
+    def statistics(self, corpus, probs, terms=None):
+        return
+
+    # Adds statistics returned by statistics to the count tables
+    def addStatistics(self, statistics):
+        self.addToTables(self.countArrays(), statistics)
+        self.logTables = {}
+
+    # adds statistics returned by statistics to the tables of the same names
+    @staticmethod
+    def addToTables(tables, statistics):
+        for name, (rows, values) in statistics.items():
+            if rows is None:
+                tables[name] += values
+            else:
+                tables[name][rows, :] += values
+
+    # Multiplies every count of the model by the factor, which leaves its probabilities unchanged but weighs it
+    # against the counts of later updates
+    def scale(self, factor):
+        self.classCounts = self.classCounts * factor
+        self.totalWords = self.totalWords * factor
+        self.wordCounts = self.wordCounts * factor
+        self.logTables = {}
+
+    # Returns the approximate number of bytes taken by the count tables and vocabulary of the model
+    def memorySize(self):
+        arrays = (self.classCounts, self.totalWords, self.wordCounts)
+        return sum(array.nbytes for array in arrays) + self.tablesSize([self.vocabulary.ids])
+
+    # returns the word ids of every sentence of the corpus back to back (-1 for words that are not in the
+    # vocabulary), the offsets at which each sentence starts within them, and the sentence each of them belongs to
+    @staticmethod
+    def flatten(corpus):
+        ids = corpus.tokenArray().astype(np.int64)
+        offsets = corpus.offsetArray()
+        return ids, offsets, np.repeat(np.arange(len(corpus)), np.diff(offsets))
+
+    # returns the count tables of the model by name, which are all that training it changes
+    def countArrays(self):
+        self.growTables()
+        return {"classCounts": self.classCounts, "totalWords": self.totalWords, "wordCounts": self.wordCounts}
+
+    # replaces the count tables of the model with ones returned by countArrays
+    def setCountArrays(self, arrays):
+        self.classCounts = arrays["classCounts"]
+        self.classes = len(self.classCounts)
+        self.totalWords = arrays["totalWords"]
+        self.wordCounts = arrays["wordCounts"]
+        self.logTables = {}
+
+    # returns the arrays of the model that scoring a prepared corpus takes by name, which are the count tables
+    def scoringArrays(self):
+        return self.countArrays()
+
+    # replaces the arrays of the model that scoring a prepared corpus takes with ones returned by scoringArrays
+    def setScoringArrays(self, arrays):
+        self.setCountArrays(arrays)
+
+    # returns the arrays of the model by name, which along with the vocabulary are all it needs to classify
+    def getArrays(self):
+        return self.countArrays()
+
+    # replaces the arrays of the model with ones returned by getArrays
+    def setArrays(self, arrays):
+        self.setCountArrays(arrays)
+
+    # pads the count tables with zeros for words added to the vocabulary since they were created
+    def growTables(self):
+        if len(self.wordCounts) < len(self.vocabulary):
+            self.wordCounts = self.padRows(self.wordCounts, len(self.vocabulary))
+            self.logTables = {}
+
+    # returns the log probability table of the name, computing it if the counts have changed since it last was
+    def logTable(self, name, compute):
+        self.growTables()
+        if name not in self.logTables:
+            self.logTables[name] = compute()
+        return self.logTables[name]
+
+    # returns log P(class) for every class
+    def logClassProbs(self):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.log(self.classCounts / self.classCounts.sum())
+
+    # returns log P(word | class) = log(wordCount / # of class words) for every word in the vocabulary, with
+    # words that haven't been seen in the class given OUT_OF_VOCAB_PROB
+    def logWordProbs(self):
+        return self.logTable("words", lambda: self.logRatio(self.wordCounts, self.totalWords))
+
+    # returns log(counts / totals) floored at log OUT_OF_VOCAB_PROB, as in Model.logRatio
+    def logRatio(self, counts, totals):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratios = np.where(totals > 0, counts / totals, 0.0)
+        return np.log(np.maximum(ratios, self.OUT_OF_VOCAB_PROB))
+
+    # converts the log proportional probabilities of each sentence into probabilities summing to 1 with the
+    # log-sum-exp trick, returning them along with the log of the normalizing constant (log P(sentence))
+    @staticmethod
+    def normalizeLogs(logProbs):
+        totals = special.logsumexp(logProbs, axis=1)
+        with np.errstate(invalid="ignore"):
+            return np.exp(logProbs - totals[:, None]), totals
+
+    # returns the n terms with the highest probability for each class as lists of WordProbs, given a (term x class)
+    # array of Pr(class | term), a mask of the terms that have appeared often enough in each class, and a function
+    # returning the name of a term id. The n best are partitioned off before only they are sorted
+    @staticmethod
+    def rankTermArrays(probs, printable, termName, n):
+        ranked = []
+        for i in range(probs.shape[1]):
+            candidates = np.flatnonzero(printable[:, i])
+            scores = probs[candidates, i]
+            if len(candidates) > n > 0:
+                # keeps every candidate at least as probable as the n-th, so that ties are still broken by id
+                nth = -np.partition(-scores, n - 1)[n - 1]
+                candidates, scores = candidates[scores >= nth], scores[scores >= nth]
+            # a stable sort keeps ties in vocabulary order
+            order = np.argsort(-scores, kind="stable")[:max(n, 0)]
+            ranked.append([WordProb.WordProb(termName(term), float(prob))
+                           for term, prob in zip(candidates[order].tolist(), scores[order].tolist())])
+        return ranked
+
+    # returns the array with rows of zeros appended so that it has the given number of rows
+    @staticmethod
+    def padRows(array, rows):
+        missing = rows - array.shape[0]
+        if missing <= 0:
+            return array
+        return np.concatenate([array, np.zeros((missing,) + array.shape[1:], dtype=array.dtype)])
+
+    # returns the rows of a (term x class) count table that a (sentence x term) count matrix adds to given the class
+    # probabilities of every sentence, along with what it adds to them. The columns of the matrix are every term up to
+    # its width, or if terms is given those terms
+    @staticmethod
+    def termStatistics(counts, probs, terms=None):
+        if terms is None:
+            terms = slice(0, counts.shape[1])
+        return terms, counts.T @ probs
+
+    # returns a (size x width) sparse matrix counting each (row, column) pair
+    @staticmethod
+    def countMatrix(rows, columns, size, width):
+        return sparse.csr_matrix((np.ones(len(rows)), (rows, columns)), shape=(size, width))
@@ -0,0 +1,46 @@
+import numpy as np
+from model import SparseModel
+
+
+# A vectorized Naive Bayes model. Prepared corpora are sparse sentence-by-vocabulary count matrices, so that a whole
+# expectation step is a single matrix product against log P(word | class), and a whole maximization step is a single
+# transposed product against the class probabilities of every sentence. Gives the same probabilities as NaiveBayes
+class SparseNaiveBayes(SparseModel.SparseModel):
+
+    # Converts the corpus into a (sentence x vocabulary) count matrix, along with the number of words in each
+    # sentence that are not in the vocabulary
+    def prepare(self, corpus):
+        ids, offsets, rows = self.flatten(corpus)
+        known = ids >= 0
+        counts = self.countMatrix(rows[known], ids[known], len(corpus), len(self.vocabulary))
+        outOfVocab = np.bincount(rows[~known], minlength=len(corpus)).astype(float)
+        return counts, outOfVocab
+
+    # Returns the part of a prepared corpus made of the sentences at the given indices
+    def select(self, corpus, indices):
+        counts, outOfVocab = corpus
+        return counts[indices], outOfVocab[indices]
+
+    # Returns a (sentence x class) array of log(P(class) * P(sentence | class)) for every sentence of a prepared corpus
+    def logJointAll(self, corpus):
+        counts, outOfVocab = corpus
+        logWordProbs = self.logWordProbs()[:counts.shape[1]]
+        logProbs = self.logClassProbs() + counts @ logWordProbs
+        return logProbs + outOfVocab[:, None] * np.log(self.OUT_OF_VOCAB_PROB)
+
+    # Returns what updating the model with every sentence of a prepared corpus and its probabilities of belonging to
+    # each class adds to each count table, as the rows added to along with their values
+    def statistics(self, corpus, probs, terms=None):
+        counts, outOfVocab = corpus
+        countTerms, outOfVocabTerms = terms or (None,) * len(corpus)
+        return {"classCounts": (None, probs.sum(axis=0)),
+                "totalWords": (None, (np.asarray(counts.sum(axis=1)).ravel() + outOfVocab) @ probs),
+                "wordCounts": self.termStatistics(counts, probs, countTerms)}
+
+    # Returns the n words with the highest Pr(thisClass | word) for each class, as a list per class of WordProbs
+    # from the most probable down, skipping those that have appeared (in expectation) less than MIN_TO_PRINT times
+    # for the class
+    def topWords(self, n):
+        # every word classified as a sentence of its own, in a single batch
+        probs = self.normalizeLogs(self.logClassProbs() + self.logWordProbs())[0]
+        return self.rankTermArrays(probs, self.wordCounts >= self.MIN_TO_PRINT, self.vocabulary.words.__getitem__, n)
@@ -0,0 +1,32 @@
+# Interns words (or any other hashable terms) as consecutive integer ids, so that the vectorized models can keep their
+# counts in arrays indexed by id instead of dicts keyed by string
+class Vocabulary:
+
+    def __init__(self):
+        # the id of each interned word
+        self.ids = {}
+        # the interned words, indexed by id
+        self.words = []
+
+    def __len__(self):
+        return len(self.words)
+
+    def __contains__(self, word):
+        return word in self.ids
+
+    # returns the id of the word, interning it if it is new and grow is set. Unknown words are None otherwise
+    def index(self, word, grow=True):
+        index = self.ids.get(word)
+        if index is None and grow:
+            index = len(self.words)
+            self.ids[word] = index
+            self.words.append(word)
+        return index
+
+    # returns a vocabulary of the words, in id order
+    @staticmethod
+    def of(words):
+        vocabulary = Vocabulary()
+        vocabulary.words = list(words)
+        vocabulary.ids = {word: index for index, word in enumerate(vocabulary.words)}
+        return vocabulary
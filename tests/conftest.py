@@ -0,0 +1,23 @@
+import os
+import sys
+
+# the modules import each other by name from src, as they do when run from there
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+
+# the words the random sentences of the tests are made of
+WORDS = ["good", "bad", "fun", "dull", "plot", "cast", "film", "story", "not", "very"]
+
+
+# the lemmas of count sentences, each of between shortest and longest words drawn at random from WORDS with rand
+def randomLemmas(rand, count, shortest=1, longest=8):
+    return [" ".join(rand.choice(WORDS) for _ in range(rand.randint(shortest, longest))) for _ in range(count)]
+
+
+# count rows of random probabilities of belonging to each of the classes, drawn with rand
+def randomProbabilities(rand, count, classes):
+    rows = []
+    for _ in range(count):
+        weights = [rand.random() for _ in range(classes)]
+        rows.append([weight / sum(weights) for weight in weights])
+    return rows
@@ -0,0 +1,64 @@
+import io
+import json
+import threading
+import urllib.request
+import ClassificationService
+
+
+# a lemmatizer that keeps every sentence as it is, but fails the batch holding the sentence "fail"
+class FailingLemmatizer:
+    def lemmatize(self, lemmatize, sentences, verbose):
+        if "fail" in sentences:
+            raise ValueError("lemmatizer failed")
+        return [Sentence(sentence) for sentence in sentences]
+
+    def close(self):
+        pass
+
+
+class Sentence:
+    def __init__(self, lemmas):
+        self.lemmas = lemmas
+
+
+class EvenModel:
+    def classifyBatch(self, sentences):
+        return [[0.5, 0.5] for _ in sentences]
+
+
+def test_serveLinesReturnsWhenABatchFails():
+    lines = ["sentence " + str(i) for i in range(3000)]
+    lines[1500] = "fail"
+    output = io.StringIO()
+    service = ClassificationService.ClassificationService(EvenModel(), FailingLemmatizer(), False, batchSize=4)
+    server = threading.Thread(target=service.serveLines, args=(lines, output), daemon=True)
+    server.start()
+    server.join(timeout=30)
+    assert not server.is_alive()
+    written = output.getvalue().splitlines()
+    assert len(written) == len(lines)
+    failed = [line for line in written if ": error: " in line]
+    assert "fail: error: lemmatizer failed" in failed
+    assert 1 <= len(failed) <= 4
+    assert written[0] == "sentence 0: 0.5 0.5 "
+
+
+def test_httpRepliesWithErrorsWhenABatchFails():
+    service = ClassificationService.ClassificationService(EvenModel(), FailingLemmatizer(), False, batchSize=1)
+    server = service.httpServer(0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    service.start()
+    try:
+        request = urllib.request.Request("http://127.0.0.1:" + str(server.server_address[1]) + "/classify",
+                                         data="fine\nfail\nalso fine\n".encode("utf-8"), method="POST")
+        with urllib.request.urlopen(request, timeout=30) as response:
+            status = response.status
+            results = json.loads(response.read().decode("utf-8"))["results"]
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.stop()
+    assert status == 200
+    assert results == [{"sentence": "fine", "probabilities": [0.5, 0.5]},
+                       {"sentence": "fail", "error": "lemmatizer failed"},
+                       {"sentence": "also fine", "probabilities": [0.5, 0.5]}]
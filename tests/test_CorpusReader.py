@@ -0,0 +1,14 @@
+import CorpusReader
+
+
+def test_firstPhrasesSkipsEmptyPhrases():
+    lines = ["PhraseId\tSentenceId\tPhrase\tSentiment",
+             "1\t1\tA fine film .\t3",
+             "2\t1\tA fine film\t3",
+             "3\t2\t \t2",
+             "4\t3\t\t2",
+             "5\t4\tDull .\t1",
+             "---",
+             "Negative:"]
+    phrases = list(CorpusReader.CorpusReader.firstPhrases(lines))
+    assert phrases == ["A fine film .", "Dull .", "---", "Negative:"]
@@ -0,0 +1,45 @@
+import json
+import LemmaCache
+
+
+def test_leastRecentlyUsedEntriesAreEvictedAtCapacity():
+    cache = LemmaCache.LemmaCache(capacity=2)
+    cache.putTag("good", "a")
+    cache.putTag("film", "n")
+    # reading good makes film the least recently used
+    assert cache.getTag("good") == "a"
+    cache.putTag("run", "v")
+    assert cache.getTag("film") is None
+    assert cache.getTag("good") == "a"
+    assert cache.getTag("run") == "v"
+    cache.putLemma("films", "n", "film")
+    cache.putLemma("ran", "v", "run")
+    cache.putLemma("better", "a", "good")
+    assert cache.getLemma("films", "n") is None
+    assert list(cache.lemmas) == [("ran", "v"), ("better", "a")]
+
+
+def test_savedCacheLoadsBack(tmp_path):
+    path = str(tmp_path / "lemmas.json")
+    cache = LemmaCache.LemmaCache(path)
+    cache.putTag("films", "n")
+    cache.putLemma("films", "n", "film")
+    cache.save()
+    loaded = LemmaCache.LemmaCache(path)
+    assert loaded.getTag("films") == "n"
+    assert loaded.getLemma("films", "n") == "film"
+    assert not loaded.changed
+
+
+def test_cacheWrittenWithAnotherNltkVersionIsIgnored(tmp_path):
+    path = tmp_path / "lemmas.json"
+    cache = LemmaCache.LemmaCache(str(path))
+    cache.putTag("films", "n")
+    cache.putLemma("films", "n", "film")
+    cache.save()
+    data = json.loads(path.read_text(encoding="utf-8"))
+    data["nltk"] = "0.0"
+    path.write_text(json.dumps(data), encoding="utf-8")
+    loaded = LemmaCache.LemmaCache(str(path))
+    assert loaded.getTag("films") is None
+    assert loaded.getLemma("films", "n") is None
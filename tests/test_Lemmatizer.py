@@ -0,0 +1,7 @@
+import Lemmatizer
+
+
+def test_regexTokenizerSplitsPunctuationRunsAsNltkDoes():
+    lemmatizer = Lemmatizer.Lemmatizer(tokenizer="regex")
+    tokens = lemmatizer.tokenize(":) a *** film --- -lrb- well-made -rrb- & $ 5")
+    assert tokens == [":)", "a", "*", "*", "*", "film", "--", "-", "-lrb-", "well-made", "-rrb-", "&", "$", "5"]
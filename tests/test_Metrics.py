@@ -0,0 +1,20 @@
+import json
+import tracemalloc
+import pytest
+import Metrics
+
+
+def test_raisingStageIsNotRecordedAndKeepsPeaksBalanced(tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    metrics = Metrics.Metrics(str(path), traceMemory=True)
+    try:
+        with metrics.stage("outer"):
+            with pytest.raises(ValueError):
+                with metrics.stage("inner"):
+                    raise ValueError("failed")
+            assert len(metrics.peaks) == 1
+        assert metrics.peaks == []
+    finally:
+        metrics.close()
+        tracemalloc.stop()
+    assert [json.loads(line)["stage"] for line in path.read_text().splitlines()] == ["outer"]
@@ -0,0 +1,39 @@
+import random
+import numpy as np
+import pytest
+import Corpus
+import ModelStore
+import Sentence
+from conftest import randomLemmas, randomProbabilities
+from model import SparseMarkov
+from model import SparseNaiveBayes
+
+# sentences of seen and unseen words to classify with the saved and loaded models
+TESTS = ["good fun film", "very dull plot not good", "unseen words only", "good unseen", "story", ""]
+
+
+# a model of the type trained on sentences of random words with random class probabilities, or if empty on none,
+# which leaves its vocabulary empty
+def trainedModel(modelType, classes, empty):
+    rand = random.Random(0)
+    model = modelType(classes)
+    lemmas = [] if empty else randomLemmas(rand, 40)
+    corpus = Corpus.Corpus.of([Sentence.Sentence(text, text) for text in lemmas], model.vocabulary)
+    model.updateAll(model.prepare(corpus), randomProbabilities(rand, len(lemmas), classes))
+    return model
+
+
+@pytest.mark.parametrize("modelType", [SparseNaiveBayes.SparseNaiveBayes, SparseMarkov.SparseMarkov])
+@pytest.mark.parametrize("classes, empty", [(2, False), (3, False), (2, True)])
+def test_loadedModelClassifiesAsSavedModel(tmp_path, modelType, classes, empty):
+    model = trainedModel(modelType, classes, empty)
+    assert (len(model.vocabulary) == 0) == empty
+    path = str(tmp_path / "model.bin")
+    ModelStore.ModelStore.save(path, model, {"lemmatize": False})
+    loaded, settings = ModelStore.ModelStore.load(path)
+    assert type(loaded) is modelType
+    assert settings == {"lemmatize": False}
+    assert len(loaded.vocabulary) == len(model.vocabulary)
+    tests = [Sentence.Sentence(text, text) for text in TESTS]
+    # the probabilities of an untrained model are all nan, which are taken as equal
+    np.testing.assert_array_equal(loaded.classifyBatch(tests), model.classifyBatch(tests))
@@ -0,0 +1,70 @@
+import random
+import threading
+import pytest
+import Corpus
+import ParallelEStep
+import Sentence
+from conftest import randomLemmas, randomProbabilities
+from model import SparseNaiveBayes
+
+
+# a vectorized model that fails to score any batch of sentences holding the word of id FAIL_ID
+class FailingNaiveBayes(SparseNaiveBayes.SparseNaiveBayes):
+    FAIL_ID = None
+
+    def logJointAll(self, corpus):
+        counts, outOfVocab = corpus
+        if self.FAIL_ID is not None and counts[:, self.FAIL_ID].nnz:
+            raise ValueError("scoring failed")
+        return super().logJointAll(corpus)
+
+
+# a prepared corpus of sentences of random words, the model initialized on it with random class probabilities and
+# those probabilities
+def trainedModel(modelType, sentences, first=None):
+    rand = random.Random(0)
+    lemmas = randomLemmas(rand, sentences, longest=6)
+    if first is not None:
+        lemmas[0] = first
+    model = modelType()
+    corpus = Corpus.Corpus.of([Sentence.Sentence(text, text) for text in lemmas], model.vocabulary)
+    prepared = model.prepare(corpus)
+    probs = randomProbabilities(rand, sentences, 2)
+    model.updateAll(prepared, probs)
+    return model, prepared, probs
+
+
+def test_resultsDoNotDependOnWorkers():
+    results = []
+    for workers in (1, 2):
+        model, prepared, probs = trainedModel(SparseNaiveBayes.SparseNaiveBayes, 100)
+        parallel = ParallelEStep.ParallelEStep(model, prepared, probs, workers)
+        try:
+            logLikelihoods = []
+            for _ in range(3):
+                logLikelihoods.append(parallel.expectation(0.0))
+                parallel.maximization()
+        finally:
+            parallel.close()
+        results.append((logLikelihoods, model.wordCounts.tolist()))
+    assert results[0] == results[1]
+
+
+# only the first shard fails, which the shards after it used to wait on forever
+def test_failingShardRaisesInsteadOfHanging():
+    model, prepared, probs = trainedModel(FailingNaiveBayes, 100, "fail")
+    FailingNaiveBayes.FAIL_ID = model.vocabulary.ids["fail"]
+    parallel = ParallelEStep.ParallelEStep(model, prepared, probs, 2)
+    raised = []
+
+    def expectation():
+        with pytest.raises(ValueError):
+            parallel.expectation(0.0)
+        raised.append(True)
+
+    runner = threading.Thread(target=expectation, daemon=True)
+    runner.start()
+    runner.join(timeout=30)
+    assert raised
+    parallel.close()
+    FailingNaiveBayes.FAIL_ID = None
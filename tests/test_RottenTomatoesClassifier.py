@@ -0,0 +1,87 @@
+import json
+import random
+import numpy as np
+import pytest
+import Corpus
+import Metrics
+import RottenTomatoesClassifier
+import Sentence
+from conftest import randomLemmas
+
+
+# a classifier set up as by the options, with a corpus of seeded and unseeded sentences of random words, prepared for
+# its model
+def classifierOf(**options):
+    classifier = RottenTomatoesClassifier.RottenTomatoesClassifier()
+    for name, value in options.items():
+        setattr(classifier, name, value)
+    classifier.model = classifier.createModel()
+    lemmas = randomLemmas(random.Random(0), 60, 2, 6)
+    for i in range(6):
+        lemmas[i] = (":)" if i % 2 else ":(") + " " + lemmas[i]
+    sentences = [Sentence.Sentence(text, text) for text in lemmas]
+    corpus = Corpus.Corpus.of(sentences, classifier.model.vocabulary)
+    return classifier, corpus, classifier.model.prepare(corpus)
+
+
+def test_restartChainsStartDifferently():
+    classifier, corpus, prepared = classifierOf(semi_supervised=True, vectorized=True, restarts=2, iterations=3)
+    RottenTomatoesClassifier.initChain(classifier, corpus, prepared)
+    first = RottenTomatoesClassifier.trainChain(0, classifier.SEED)[0].wordCounts.copy()
+    second = RottenTomatoesClassifier.trainChain(1, classifier.SEED + 1)[0].wordCounts.copy()
+    assert not np.allclose(first, second)
+
+
+def test_restartChainsAreRankedOnTheModelReturned():
+    classifier, corpus, prepared = classifierOf(semi_supervised=True, vectorized=True, restarts=2, iterations=3)
+    RottenTomatoesClassifier.initChain(classifier, corpus, prepared)
+    model, logLikelihood, rounds, seconds = RottenTomatoesClassifier.trainChain(0, classifier.SEED)
+    assert rounds == 3
+    assert logLikelihood == model.scoreAll(prepared)[1]
+
+
+def test_restartsKeepTheBestChain():
+    classifier, corpus, prepared = classifierOf(semi_supervised=True, vectorized=True, restarts=3, iterations=3,
+                                                fixed_seed=True)
+    classifier.trainRestarts(corpus, prepared)
+    chains, corpus, prepared = classifierOf(semi_supervised=True, vectorized=True, restarts=3, iterations=3)
+    RottenTomatoesClassifier.initChain(chains, corpus, prepared)
+    best = max(RottenTomatoesClassifier.trainChain(chain, chains.SEED + chain)[1] for chain in range(3))
+    assert classifier.model.scoreAll(prepared)[1] == best
+
+
+# the count tables of a dict model, the totals per class included
+def countTables(model):
+    tables = [model.classCounts, model.totalWords] + model.wordCounts
+    if hasattr(model, "bigramCounts"):
+        tables += model.bigramCounts + model.bigramDenomsCounts
+    return tables
+
+
+@pytest.mark.parametrize("naiveBayes", [True, False])
+def test_incrementalMaximizationMatchesRebuildingTheModel(naiveBayes):
+    classifier, corpus, prepared = classifierOf(naive_bayes=naiveBayes, iterations=3)
+    classifier.expectationMaximization(corpus, prepared, random.Random(0), False)
+    rebuilt = classifier.createModel()
+    classes = classifier.randomInit(corpus, random.Random(0))
+    rebuilt.updateAll(prepared, classes)
+    for _ in range(3):
+        classes = rebuilt.scoreAll(prepared)[0]
+        rebuilt.reset()
+        rebuilt.updateAll(prepared, classes)
+    for table, rebuiltTable in zip(countTables(classifier.model), countTables(rebuilt)):
+        assert table == pytest.approx(rebuiltTable, rel=1e-9)
+
+
+def test_updateEpsilonSkipsSentencesThatBarelyChanged(tmp_path):
+    skipped = []
+    for epsilon in (0.0, 0.01, 1.0):
+        classifier, corpus, prepared = classifierOf(iterations=3, update_epsilon=epsilon)
+        classifier.metrics = Metrics.Metrics(str(tmp_path / (str(epsilon) + ".jsonl")))
+        classifier.expectationMaximization(corpus, prepared, random.Random(0), False)
+        classifier.metrics.close()
+        records = [json.loads(line) for line in (tmp_path / (str(epsilon) + ".jsonl")).read_text().splitlines()]
+        skipped.append([len(corpus) - r["sentences"] for r in records if r["stage"] == "maximization"])
+    assert skipped[0] == [0, 0, 0]
+    assert 0 < sum(skipped[1]) < 3 * len(corpus)
+    assert skipped[2] == [len(corpus)] * 3
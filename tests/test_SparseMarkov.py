@@ -0,0 +1,17 @@
+import pytest
+import Sentence
+from model import Markov
+from model import SparseMarkov
+from test_SparseNaiveBayes import TESTS, toyCorpus
+
+
+@pytest.mark.parametrize("classes", [2, 3])
+def test_logJointMatchesMarkov(classes):
+    model = Markov.Markov(classes)
+    sparseModel = SparseMarkov.SparseMarkov(classes)
+    for sentence, probs in toyCorpus(classes):
+        model.update(sentence, probs)
+        sparseModel.update(sentence, probs)
+    for text in TESTS:
+        sentence = Sentence.Sentence(text, text)
+        assert sparseModel.logJoint(sentence) == pytest.approx(model.logJoint(sentence), rel=1e-9)
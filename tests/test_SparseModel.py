@@ -0,0 +1,36 @@
+import pytest
+from model import SparseModel
+
+
+# a vectorized model that defines everything but how to score sentences
+class UnscoredModel(SparseModel.SparseModel):
+    def prepare(self, corpus):
+        return ()
+
+    def statistics(self, corpus, probs, terms=None):
+        return {}
+
+    def topWords(self, n):
+        return []
+
+
+def test_modelWithoutLogJointAllCantBeCreated():
+    with pytest.raises(TypeError):
+        UnscoredModel()
+
+
+# a vectorized model that defines everything but what updating it adds to its counts
+class UncountedModel(SparseModel.SparseModel):
+    def prepare(self, corpus):
+        return ()
+
+    def logJointAll(self, corpus):
+        return None
+
+    def topWords(self, n):
+        return []
+
+
+def test_modelWithoutStatisticsCantBeCreated():
+    with pytest.raises(TypeError):
+        UncountedModel()
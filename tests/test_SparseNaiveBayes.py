@@ -0,0 +1,30 @@
+import random
+import pytest
+import Sentence
+from conftest import randomLemmas, randomProbabilities
+from model import NaiveBayes
+from model import SparseNaiveBayes
+
+
+# sentences of random words, each with random probabilities of belonging to each of the classes
+def toyCorpus(classes, sentences=40):
+    rand = random.Random(0)
+    lemmas = randomLemmas(rand, sentences)
+    probs = randomProbabilities(rand, sentences, classes)
+    return [(Sentence.Sentence(text, text), row) for text, row in zip(lemmas, probs)]
+
+
+# sentences of seen and unseen words to score the trained models on
+TESTS = ["good fun film", "very dull plot not good", "unseen words only", "good unseen", "story"]
+
+
+@pytest.mark.parametrize("classes", [2, 3])
+def test_logJointMatchesNaiveBayes(classes):
+    model = NaiveBayes.NaiveBayes(classes)
+    sparseModel = SparseNaiveBayes.SparseNaiveBayes(classes)
+    for sentence, probs in toyCorpus(classes):
+        model.update(sentence, probs)
+        sparseModel.update(sentence, probs)
+    for text in TESTS:
+        sentence = Sentence.Sentence(text, text)
+        assert sparseModel.logJoint(sentence) == pytest.approx(model.logJoint(sentence), rel=1e-9)